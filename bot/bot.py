@@ -3,6 +3,7 @@
 import time
 from typing import Optional, Set
 
+import numpy as np
 from sc2.bot_ai import BotAI
 from sc2.data import Race, Result
 from sc2.ids.ability_id import AbilityId
@@ -10,6 +11,7 @@ from sc2.ids.buff_id import BuffId
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.position import Point2
 from sc2.unit import Unit
+from sc2.unit_command import UnitCommand
 
 from .managers.expansion_manager import ExpansionManager
 from .managers.production_manager import ProductionManager
@@ -17,14 +19,53 @@ from .managers.stats_manager import StatsManager
 from .managers.unit_manager import UnitManager
 from .mapcleanup import Cleanup
 from .speedmining import SpeedMining
+from .frame_snapshot import FrameSnapshot
+from .unit_index import UnitIndex
 from .builds import get_build
 
+# Ids used in the per-step logic, resolved once instead of on every lookup
+_HARVEST_GATHER = AbilityId.HARVEST_GATHER
+_INJECT = AbilityId.EFFECT_INJECTLARVA
+_ZERGLING = UnitTypeId.ZERGLING
+_OVERLORD = UnitTypeId.OVERLORD
+_QUEEN = UnitTypeId.QUEEN
+_SPAWNINGPOOL = UnitTypeId.SPAWNINGPOOL
+_SPIRE = UnitTypeId.SPIRE
+_MUTALISK = UnitTypeId.MUTALISK
+
 
 class CompetitiveBot(BotAI):
     """Main bot class implementing a competitive Zerg strategy."""
 
     NAME: str = "Crawler"
     RACE: Race = Race.Zerg
+    ATTACK_COOLDOWN_S: float = 30.0  # Game seconds between attack waves
+    GAME_STEP: int = 4  # Game frames advanced per on_step call
+    GAS_CHECK_STEPS: int = 8  # on_step calls between gas saturation checks
+
+    # Unit types whose pending counts are snapshotted once per step
+    _PENDING_TYPES: tuple = (
+        UnitTypeId.SPAWNINGPOOL,
+        UnitTypeId.OVERLORD,
+        UnitTypeId.QUEEN
+    )
+
+    IGNORED_TYPES: frozenset = frozenset({
+        UnitTypeId.MULE,
+        UnitTypeId.LARVA,
+        UnitTypeId.EGG,
+        UnitTypeId.DRONE
+    })
+
+    # Unit types that do not count towards the attacking army
+    EXCLUDED_ARMY_TYPES: frozenset = frozenset({
+        UnitTypeId.OVERLORD,
+        UnitTypeId.DRONE,
+        UnitTypeId.QUEEN,
+        UnitTypeId.LARVA,
+        UnitTypeId.OVERSEER,
+        UnitTypeId.MUTALISK
+    })
 
     def __init__(self, build_name: Optional[str] = None):
         """Initialize the bot with managers."""
@@ -33,18 +74,20 @@ class CompetitiveBot(BotAI):
         self.opponent_name = None
         self.totalattacks = 0
         self.last_kill_gameloop = 0
-        self.last_attack_frame = 0  # Initialize last attack frame
-        self.ignored_types = {
-            UnitTypeId.MULE,
-            UnitTypeId.LARVA,
-            UnitTypeId.EGG,
-            UnitTypeId.DRONE
-        }
+        self.last_attack_time = 0.0  # Game time of the last attack wave
+        self.attacked = False
+        self.attack_staged = False
+        self.attack_stage_time = 0.0
+        self.previous_result_shown = False
+        self._debug_tick = 0  # Game frames since the last attack debug print
+        self.initial_worker_assignments = []
 
         # Initialize managers
         self.expansion_manager = ExpansionManager(self)
         self.production_manager = ProductionManager(self)
         self.unit_manager = UnitManager(self)
+        self.unit_index = UnitIndex(self)
+        self.frame_snapshot = FrameSnapshot(self)  # Worker and mineral arrays shared with the managers
         
         # Initialize build strategy
         self.build_strategy = get_build(build_name)
@@ -52,17 +95,36 @@ class CompetitiveBot(BotAI):
         # Initialize stats manager
         self.stats_manager = StatsManager(self)
         
-        # Track zergling attack status
-        self.zergling_attack_status: dict[int, str] = {}
-        self.all_armies = []  # Track army sizes throughout the game
+        # Tags of zerglings that have been sent to attack
+        self._attacking_tags: Set[int] = set()
+        self.all_armies: list[int] = []  # Army size sampled once per game minute
         self.max_army_supply = 0  # Track maximum army supply in this game
+        self._army_count = 0  # Own army units alive, maintained from unit events
+        self._tag_types: dict[int, UnitTypeId] = {}  # Own unit types, for destroyed events
         self.current_army_supply = self.build_strategy.DEFAULT_ARMY_AMOUNT  # Initialize with default amount
 
+        # Inputs the build strategy reacts to, used to skip unchanged steps
+        self._last_build_state: Optional[tuple] = None
+        self._structure_completed = False
+        self._natural_found = False
+
+        # Game time before which each build block has nothing to do
+        self._next_check: dict[str, float] = {
+            "pool": 0.0
+        }
+
     async def on_start(self):
         """Called when the game starts.""" 
         print("Game started")
+        self.client.game_step = self.GAME_STEP
         
-        # Store initial worker assignments for repeated commands
+        # Starting units (drones, larva, overlord) never get an on_unit_created event
+        for unit in self.units:
+            self._tag_types[unit.tag] = unit.type_id
+            if unit.type_id not in self.EXCLUDED_ARMY_TYPES:
+                self._army_count += 1
+        
+        # Store initial worker assignments so dropped commands can be re-issued once
         self.initial_worker_assignments = []
         
         # Do initial worker split FIRST before anything else
@@ -75,54 +137,39 @@ class CompetitiveBot(BotAI):
             # Split into close (first 4) and far (next 4) patches
             close_patches = mineral_fields[:4]
             far_patches = mineral_fields[4:8]
-            available_workers = set(self.workers.take(12))  # Get first 12 workers
+            available_workers = list(self.workers.take(12))  # Get first 12 workers
+            worker_xy = np.array([w.position for w in available_workers], dtype=float)
+            taken = np.zeros(len(available_workers), dtype=bool)
             
             # For each close patch (first 4), assign 2 closest workers
             for patch in close_patches:
-                if len(available_workers) < 2:
+                if len(available_workers) - taken.sum() < 2:
                     break
                     
                 # Get 2 closest workers for this patch
                 for _ in range(2):
-                    if available_workers:
-                        worker = min(available_workers, key=lambda w: w.distance_to(patch))
-                        available_workers.remove(worker)
-                        worker.gather(patch, queue=True)
-                        self.initial_worker_assignments.append((worker, patch.position, patch))
+                    worker = available_workers[self._take_closest(worker_xy, taken, patch.position)]
+                    self.initial_worker_assignments.append((worker, patch.position, patch))
             
             # For each far patch (next 4), assign 1 closest worker
             for patch in far_patches:
-                if not available_workers:
+                if taken.all():
                     break
                     
-                worker = min(available_workers, key=lambda w: w.distance_to(patch))
-                available_workers.remove(worker)
-                worker.gather(patch, queue=True)
+                worker = available_workers[self._take_closest(worker_xy, taken, patch.position)]
                 self.initial_worker_assignments.append((worker, patch.position, patch))
             
-            # Issue first set of gather commands
-            self.worker_split_frame = 0
-            for worker, pos, patch in self.initial_worker_assignments:
-                worker.gather(patch)
+            # Issue gather commands right away as one batch
+            await self._issue_worker_split()
 
         # Initialize remaining components
-        self.start_time = time.time()
+        self.start_time = self.time
         self.opponent_name = str(self.enemy_race)  # Use enemy_race as name too
         self.cleanup = Cleanup(self)
         self.speed_mining = SpeedMining(self)
         
-        # Initialize attack tracking
-        self.previous_result_shown = False
-        
-        # Wait for game to fully initialize before sending chat
-        await self._client.step()
-        await self._client.step()
-        
         # Show opponent summary in all chat
-        await self.stats_manager.send_chat(self.stats_manager.get_opponent_summary())
-        
-        # Wait a bit between messages
-        await self._client.step()
+        messages = [self.stats_manager.get_opponent_summary()]
         
         # Show previous match result if we have one
         last_result = self.build_strategy.get_last_game_result(self.opponent_id)
@@ -136,60 +183,96 @@ class CompetitiveBot(BotAI):
         curr_wins, curr_losses, curr_winrate = self.build_strategy.get_supply_stats(self.opponent_id, current_army_amount)
         
         if last_result:
-            result_msg = f"{self.NAME} {last_result} the previous match using {self.build_strategy.NAME} {previous_army_amount} build - {prev_winrate:.1f}% WR ({prev_wins}-{prev_losses})"
-            await self.stats_manager.send_chat(result_msg)
+            messages.append(f"{self.NAME} {last_result} the previous match using {self.build_strategy.NAME} {previous_army_amount} build - {prev_winrate:.1f}% WR ({prev_wins}-{prev_losses})")
         else:
             # If no previous game, show initial message with current stats
-            result_msg = f"{self.NAME} starting first match using {self.build_strategy.NAME} build - {curr_winrate:.1f}% WR ({curr_wins}-{curr_losses})"
-            await self.stats_manager.send_chat(result_msg)
-            
-        # Wait a bit between messages
-        await self._client.step()
+            messages.append(f"{self.NAME} starting first match using {self.build_strategy.NAME} build - {curr_winrate:.1f}% WR ({curr_wins}-{curr_losses})")
         
         # Show current match army supply target
-        await self.stats_manager.send_chat(f"Crawler will be attacking with army supply amount of {current_army_amount} (Winrate {curr_winrate:.1f}% ({curr_wins}-{curr_losses}))")
-        
-        # Wait a bit between messages
-        await self._client.step()
+        messages.append(f"Crawler will be attacking with army supply amount of {current_army_amount} (Winrate {curr_winrate:.1f}% ({curr_wins}-{curr_losses}))")
         
         # Announce build and stats
-        await self.stats_manager.send_chat(self.build_strategy.get_status_text())
+        messages.append(self.build_strategy.get_status_text())
         
-        # Initialize last attack frame
-        self.last_attack_frame = 0
-        self.attack_stage_time = 0.0
+        # Wait for game to fully initialize, then send all messages back to back
+        await self._client.step()
+        await self._client.step()
+        for message in messages:
+            await self.stats_manager.send_chat(message)
         
         # Complete parent initialization last
         await super().on_start()
 
+    async def _issue_worker_split(self) -> None:
+        """Send all initial worker split gather commands in a single actions request."""
+        await self.client.actions([
+            UnitCommand(_HARVEST_GATHER, worker, target=patch)
+            for worker, pos, patch in self.initial_worker_assignments
+        ])
+
+    def _townhall_positions(self) -> np.ndarray:
+        """Get townhall positions as an (N, 2) array, in self.townhalls order."""
+        return np.array([th.position for th in self.townhalls], dtype=float)
+
+    @staticmethod
+    def _take_closest(positions: np.ndarray, taken: np.ndarray, target: Point2) -> int:
+        """Mark and return the index of the closest position not yet taken.
+        
+        Args:
+            positions: (N, 2) array of candidate positions
+            taken: Boolean mask of candidates already taken, updated in place
+            target: Position to measure squared distances from
+            
+        Returns:
+            Index of the chosen candidate
+        """
+        offsets = positions - np.array(target, dtype=float)
+        dist_sq = (offsets * offsets).sum(axis=1)
+        dist_sq[taken] = np.inf
+        index = int(np.argmin(dist_sq))
+        taken[index] = True
+        return index
+
     async def on_step(self, iteration: int):
         """Execute bot logic for each game step.
         
         Args:
             iteration: Current game iteration
         """
-        # Re-issue worker split commands for the first few frames
-        if hasattr(self, 'worker_split_frame'):
-            if self.worker_split_frame < 5:  # First 5 frames
-                # Issue gather commands every frame
-                for worker, pos, patch in self.initial_worker_assignments:
+        # On the first step, re-issue the split only to workers that dropped their command
+        if self.initial_worker_assignments:
+            idle_tags = self.workers.idle.tags
+            for worker, pos, patch in self.initial_worker_assignments:
+                if worker.tag in idle_tags:
                     worker.gather(patch)
-                self.worker_split_frame += 1
-            elif self.worker_split_frame == 5:
-                # Cleanup after we're done
-                del self.worker_split_frame
-                del self.initial_worker_assignments
+            self.initial_worker_assignments = []
         
         # Track army size
-        excluded_types = [UnitTypeId.OVERLORD, UnitTypeId.DRONE, UnitTypeId.QUEEN, UnitTypeId.LARVA, UnitTypeId.OVERSEER, UnitTypeId.MUTALISK]
-        current_army = self.units.exclude_type(excluded_types)
-        if current_army.amount > 0:
-            self.all_armies.append(current_army)
-            if current_army.amount > self.max_army_supply:
-                self.max_army_supply = current_army.amount
-
-        # Run build-specific logic
-        await self.build_strategy.on_step(self)
+        if self.time // 60 >= len(self.all_armies):
+            self.all_armies.append(self._army_count)
+        if self._army_count > self.max_army_supply:
+            self.max_army_supply = self._army_count
+
+        # Per-step unit snapshots reused below and by the managers
+        self.unit_index.update()
+        self.frame_snapshot.update()
+        zerglings = self.unit_index(_ZERGLING)
+        queens = self.unit_index(_QUEEN)
+        n_zerglings = zerglings.amount
+        pools = self.structures(_SPAWNINGPOOL)
+        has_pool = pools.exists
+        pool_ready = pools.ready.exists
+        spire_ready = self.structures(_SPIRE).ready.exists
+        # Pending counts only change between observations, so one lookup per type suffices.
+        # can_afford stays live since issuing commands subtracts their cost.
+        pending = {unit_type: self.already_pending(unit_type) for unit_type in self._PENDING_TYPES}
+
+        # Run build-specific logic only when something it reacts to has changed
+        build_state = (self.minerals, self.vespene, self.larva.amount, self.supply_left)
+        if build_state != self._last_build_state or self._structure_completed:
+            self._last_build_state = build_state
+            self._structure_completed = False
+            await self.build_strategy.on_step(self)
         
         # Debug messages
         if iteration % 600 == 0:
@@ -203,66 +286,55 @@ class CompetitiveBot(BotAI):
         self.speed_mining.on_step()
         
         # Check for zergling cap before training
-        current_zergling_count = len(self.units(UnitTypeId.ZERGLING))
-        if current_zergling_count >= self.cleanup.max_zerglings:
-            self.production_manager.add_production_pause(UnitTypeId.ZERGLING)
-        elif current_zergling_count < self.cleanup.max_zerglings:
+        if n_zerglings >= self.cleanup.max_zerglings:
+            # Only add the pause once instead of stacking a new one every step. Timed
+            # pauses (like cleanup's) don't count, since they can expire mid-step
+            if not self.production_manager.has_indefinite_pause(_ZERGLING):
+                self.production_manager.add_production_pause(_ZERGLING)
+        elif not self.cleanup.cleanup_mode_active:
             # Remove pause if we're under the cap and not in cleanup mode
-            if (UnitTypeId.ZERGLING in self.production_manager.production_pauses
-                and not self.cleanup.cleanup_mode_active):
-                del self.production_manager.production_pauses[UnitTypeId.ZERGLING]
+            self.production_manager.production_pauses.pop(_ZERGLING, None)
         
         # Update cleanup and handle drone production
         await self.cleanup.update()
         await self.cleanup.continue_building_drones()
 
-        # Maintain zergling status dict
-        current_zerglings = self.units(UnitTypeId.ZERGLING)
-        current_tags = set(z.tag for z in current_zerglings)
-        # Remove dead zerglings
-        self.zergling_attack_status = {tag: status for tag, status in self.zergling_attack_status.items() if tag in current_tags}
-        # Add new zerglings
-        for z in current_zerglings:
-            if z.tag not in self.zergling_attack_status:
-                self.zergling_attack_status[z.tag] = "not attacking"
-
         # Time to attack
-        if not hasattr(self, "attacked"):
-            self.attacked = False
-            self.last_attack_frame = 0
-            self.attack_staged = False
-            self.attack_stage_time = 0.0
-
-        excluded_types = [UnitTypeId.OVERLORD, UnitTypeId.DRONE, UnitTypeId.QUEEN, UnitTypeId.LARVA, UnitTypeId.OVERSEER, UnitTypeId.MUTALISK]
-        army = self.units.exclude_type(excluded_types)
         army_supply = self.supply_army  # Use supply instead of unit count
-        zerglings = self.units(UnitTypeId.ZERGLING)
-        not_attacking_zerglings = [z for z in zerglings if self.zergling_attack_status.get(z.tag, "not attacking") == "not attacking"]
 
-        # Attack cooldown in game frames (22.4 frames per second)
-        attack_cooldown = 30 * 22.4  # ~30 seconds
-
-        # Only print attack conditions every 30 seconds (about 672 frames)
-        if self.time * 22.4 % 672 < 1:
+        # Only print attack conditions every 30 seconds (672 frames), and never
+        # when running optimized (the ladder starts the bot with -O)
+        if __debug__:
+            self._debug_tick += self.client.game_step
+        if __debug__ and self._debug_tick >= 672:
+            self._debug_tick = 0
             print(f"Army supply: {army_supply}, Target: {self.current_army_supply}")
-            print(f"Time since last attack: {self.time * 22.4 - self.last_attack_frame}, Cooldown: {attack_cooldown}")
-            print(f"Attack conditions: supply={army_supply >= self.current_army_supply}, cooldown={self.time * 22.4 - self.last_attack_frame > attack_cooldown}, not_cleanup={not self.cleanup.cleanup_mode_active}")
+            print(f"Time since last attack: {self.time - self.last_attack_time:.1f}s, Cooldown: {self.ATTACK_COOLDOWN_S}s")
+            print(f"Attack conditions: supply={army_supply >= self.current_army_supply}, cooldown={self.time - self.last_attack_time > self.ATTACK_COOLDOWN_S}, not_cleanup={not self.cleanup.cleanup_mode_active}")
             print(f"Attack stage time: {self.attack_stage_time}, Stage 1 duration: {self.time - self.attack_stage_time if self.attack_stage_time != 0.0 else 0}")
 
-        # Two-stage attack logic
+        # Every tracked tag is a live zergling, so fewer tags than zerglings
+        # means at least one zergling has not been sent to attack yet
+        has_idle_zerglings = n_zerglings > len(self._attacking_tags)
+
+        # Two-stage attack logic, skipped when there is no wave to stage or launch
         if (
-            army_supply >= self.current_army_supply
-            and self.time * 22.4 - self.last_attack_frame > attack_cooldown
+            (has_idle_zerglings or self.attack_stage_time != 0.0)
+            and army_supply >= self.current_army_supply
+            and self.time - self.last_attack_time > self.ATTACK_COOLDOWN_S
             and not self.cleanup.cleanup_mode_active  # Don't do army attacks in cleanup mode
         ):
             # Stage 1: Move zerglings to the furthest friendly base
             if self.attack_stage_time == 0.0:
                 self.attack_stage_time = self.time  # Use game time instead of wall clock time
                 print("Stage 1: Zerglings staging at furthest friendly base")
+                not_attacking_zerglings = [z for z in zerglings if z.tag not in self._attacking_tags]
                 
                 # Find furthest base from start location
                 if self.townhalls:  # Only try to find furthest base if we have any
-                    furthest_base = max(self.townhalls, key=lambda th: th.position.distance_to(self.start_location))
+                    # Compare squared distances in one vectorized pass
+                    offsets = self._townhall_positions() - np.array(self.start_location, dtype=float)
+                    furthest_base = self.townhalls[int(np.argmax((offsets * offsets).sum(axis=1)))]
                     # Send zerglings to furthest base
                     for z in not_attacking_zerglings:
                         z.move(furthest_base.position)
@@ -274,26 +346,32 @@ class CompetitiveBot(BotAI):
             elif self.attack_stage_time != 0.0 and self.time - self.attack_stage_time >= 10.0:
                 # Check if enemy main is cleared
                 enemy_main = self.enemy_start_locations[0]
-                enemy_structures_in_main = self.enemy_structures.closer_than(10, enemy_main)
-                zerglings_in_main = self.units(UnitTypeId.ZERGLING).closer_than(10, enemy_main)
-                enemy_main_cleared = len(enemy_structures_in_main) == 0 and len(zerglings_in_main) > 0
+                enemy_structures = self.enemy_structures
+                structure_xy = np.array([s.position for s in enemy_structures], dtype=float).reshape(-1, 2)
+                offsets = structure_xy - np.array(enemy_main, dtype=float)
+                structures_in_main = bool(((offsets * offsets).sum(axis=1) < 10 ** 2).any())
+                zerglings_in_main = self.unit_index.within_radius(_ZERGLING, enemy_main, 10)
+                enemy_main_cleared = not structures_in_main and len(zerglings_in_main) > 0
 
                 # If main is cleared, look for other visible enemy structures
                 attack_target = enemy_main
-                if enemy_main_cleared and self.enemy_structures:
-                    visible_structures = self.enemy_structures.filter(lambda s: self.is_visible(s.position))
-                    if visible_structures:
-                        attack_target = visible_structures.random.position
+                if enemy_main_cleared and enemy_structures:
+                    # Same lookup as is_visible() (Point2.rounded floors), done for all structures at once
+                    grid = np.floor(structure_xy).astype(int)
+                    visible = np.flatnonzero(self.state.visibility.data_numpy[grid[:, 1], grid[:, 0]] == 2)
+                    if visible.size:
+                        attack_target = enemy_structures[int(np.random.choice(visible))].position
                         message = f"Attack #{self.totalattacks} redirected to enemy structure at {attack_target}"
                         print(message)
                         await self.chat_send(message)
 
+                not_attacking_zerglings = [z for z in zerglings if z.tag not in self._attacking_tags]
                 for z in not_attacking_zerglings:
                     z.attack(attack_target)
-                    self.zergling_attack_status[z.tag] = "attacking"
+                self._attacking_tags.update(z.tag for z in not_attacking_zerglings)
                 army_supply = self.supply_army
                 self.totalattacks += 1
-                self.last_attack_frame = self.time * 22.4  # Update last attack frame
+                self.last_attack_time = self.time  # Update last attack time
                 self.attack_stage_time = 0.0  # Reset attack stage time
                 if not enemy_main_cleared:  # Only print default message if not redirected
                     message = f"Attack #{self.totalattacks} with {army_supply} supply"
@@ -301,91 +379,105 @@ class CompetitiveBot(BotAI):
                     await self.chat_send(message)
 
         # Assign workers to gas
-        for assimilator in self.gas_buildings.ready:
-            if assimilator.assigned_harvesters < assimilator.ideal_harvesters:
-                # First try to find idle workers
-                workers = self.workers.filter(
-                    lambda w: not w.is_carrying_vespene and 
-                             not w.is_carrying_minerals and 
-                             (not w.orders or w.is_idle)
-                )
-                
-                # If no idle workers, get mineral workers
-                if not workers:
-                    workers = self.workers.filter(
-                        lambda w: not w.is_carrying_vespene and
-                                w.orders and
-                                w.orders[0].ability.id in [AbilityId.HARVEST_GATHER] and
-                                isinstance(w.orders[0].target, int) and
-                                self.mineral_field.find_by_tag(w.orders[0].target) is not None
-                    )
-                
-                if workers:  # If we have any workers (idle or mineral)
-                    # Take up to 3 workers
-                    needed = min(assimilator.ideal_harvesters - assimilator.assigned_harvesters, 3)
-                    for _ in range(needed):
-                        if workers:
-                            workers.random.gather(assimilator)
+        # Harvester counts only settle after workers arrive, so this need not run every step
+        hungry_gas = [] if iteration % self.GAS_CHECK_STEPS else [
+            a for a in self.gas_buildings.ready if a.assigned_harvesters < a.ideal_harvesters
+        ]
+        if hungry_gas:
+            # Classify workers once for all extractors: idle workers are preferred,
+            # mineral workers are only taken when none are idle
+            mineral_tags = frozenset(m.tag for m in self.mineral_field)
+            idle_workers = []
+            mineral_workers = []
+            for w in self.workers:
+                if w.is_carrying_vespene:
+                    continue
+                if not w.is_carrying_minerals and (not w.orders or w.is_idle):
+                    idle_workers.append(w)
+                elif (w.orders and
+                      w.orders[0].ability.id == _HARVEST_GATHER and
+                      w.orders[0].target in mineral_tags):
+                    mineral_workers.append(w)
+
+            for assimilator in hungry_gas:
+                # Take up to 3 workers, popping them so no worker is sent to two extractors
+                needed = min(assimilator.ideal_harvesters - assimilator.assigned_harvesters, 3)
+                candidates = idle_workers or mineral_workers
+                for _ in range(min(needed, len(candidates))):
+                    candidates.pop().gather(assimilator)
 
         # Build spawning pool
-        if (not self.structures(UnitTypeId.SPAWNINGPOOL) and 
-            not self.already_pending(UnitTypeId.SPAWNINGPOOL) and 
-            self.can_afford(UnitTypeId.SPAWNINGPOOL)):
-            # Calculate position near our first hatchery
-            pool_position = self.start_location.towards(self.game_info.map_center, 3)
-            # Try to find a valid placement near our calculated position
-            if await self.build_structure(UnitTypeId.SPAWNINGPOOL, near=pool_position):
-                print(f"Spawning pool started")
+        if self.time >= self._next_check["pool"]:
+            if (has_pool or
+                pending[_SPAWNINGPOOL]):
+                # Pool is up or on its way, only re-check in case it gets destroyed
+                self._next_check["pool"] = self.time + 10
+            elif self.can_afford(_SPAWNINGPOOL):
+                # Calculate position near our first hatchery
+                pool_position = self.start_location.towards(self.game_info.map_center, 3)
+                # Try to find a valid placement near our calculated position
+                if await self.build_structure(_SPAWNINGPOOL, near=pool_position):
+                    print(f"Spawning pool started")
 
         # Build expansion if we have enough minerals
-        if self.minerals >= 350 and self.can_afford(UnitTypeId.HATCHERY):
+        if (self.minerals >= 350 and self.time >= self.expansion_manager.expansion_cooldown and
+            self.can_afford(UnitTypeId.HATCHERY)):
             natural = await self.expansion_manager.get_next_expansion()
             if natural:
                 print(f"Expanding to {natural}")  # Debug print
                 if await self.build(UnitTypeId.HATCHERY, near=natural):
                     # Only set cooldown if build succeeded
-                    self.expansion_manager.expansion_cooldown = time.time() + 60  # 1 minute cooldown
+                    self.expansion_manager.expansion_cooldown = self.time + 60  # 1 minute cooldown
+            else:
+                # No free expansion, avoid re-querying pathing every step
+                self.expansion_manager.expansion_cooldown = self.time + 5
 
         # Build overlord
-        if self.supply_left <= 3 and self.supply_used != 200 and self.already_pending(UnitTypeId.OVERLORD) == 0 and self.larva:
-            self.train(UnitTypeId.OVERLORD, 1)  # Only make one overlord at a time
+        if self.supply_left <= 3 and self.supply_used != 200 and pending[_OVERLORD] == 0 and self.larva:
+            self.train(_OVERLORD, 1)  # Only make one overlord at a time
 
         # Set rally point for zerglings once we have 2 bases
-        if not self.unit_manager.zergling_rally_point and self.townhalls.amount >= 2:
+        if not self._natural_found and self.townhalls.amount >= 2:
+            # Natural is the townhall with the second smallest squared distance to our main
+            offsets = self._townhall_positions() - np.array(self.start_location, dtype=float)
+            natural = self.townhalls[int(np.argpartition((offsets * offsets).sum(axis=1), 1)[1])]
             # Rally between natural and enemy base
-            natural = self.townhalls.sorted_by_distance_to(self.start_location)[1]
             enemy_base = self.enemy_start_locations[0]
             rally_point = natural.position.towards(enemy_base, 15)  # 15 units in front of natural
             self.unit_manager.zergling_rally_point = rally_point
+            self._natural_found = True
 
         # Build zerglings if not paused
-        if (self.structures(UnitTypeId.SPAWNINGPOOL).ready and self.larva and 
-            not self.production_manager.is_production_paused(UnitTypeId.ZERGLING)):
-            if self.supply_left <= 2 and self.already_pending(UnitTypeId.OVERLORD) == 0:
+        if (pool_ready and self.larva and 
+            not self.production_manager.is_production_paused(_ZERGLING)):
+            if self.supply_left <= 2 and pending[_OVERLORD] == 0:
                 return  # Don't make zerglings if supply is low and no overlord is being built
             
-            self.train(UnitTypeId.ZERGLING, self.larva.amount)
+            self.train(_ZERGLING, self.larva.amount)
 
         # Build mutalisks when spire is ready
-        if (self.structures(UnitTypeId.SPIRE).ready and self.larva and 
-            self.can_afford(UnitTypeId.MUTALISK) and 
-            self.units(UnitTypeId.MUTALISK).amount < 5):
-            self.train(UnitTypeId.MUTALISK)
+        if (spire_ready and self.larva and 
+            self.can_afford(_MUTALISK) and 
+            len(self.unit_index.by_type[_MUTALISK]) < 5):
+            self.train(_MUTALISK)
 
-        # Update cleanup last (may override attack commands)
-        # await self.cleanup.update()
-        
         # Train queen
-        if self.structures(UnitTypeId.SPAWNINGPOOL).ready and self.units(UnitTypeId.QUEEN).amount == 0 and self.already_pending(UnitTypeId.QUEEN) == 0:
-            self.train(UnitTypeId.QUEEN, 1)
+        if pool_ready and not queens and pending[_QUEEN] == 0:
+            self.train(_QUEEN, 1)
 
         # Inject larva with queens
-        if self.units(UnitTypeId.QUEEN).ready:
-            for queen in self.units(UnitTypeId.QUEEN).idle:
-                if queen.energy >= 25:
-                    # Find closest townhall to this queen
-                    closest_base = self.townhalls.closest_to(queen)
-                    queen(AbilityId.EFFECT_INJECTLARVA, closest_base)
+        if queens:
+            # One pass over the queens instead of chaining the ready and idle filters
+            inject_queens = [queen for queen in queens
+                             if queen.is_ready and queen.is_idle and queen.energy >= 25]
+            if inject_queens and self.townhalls:
+                # Find closest townhall to each queen with one squared-distance broadcast
+                th_xy = self._townhall_positions()
+                queen_xy = np.array([queen.position for queen in inject_queens], dtype=float)
+                offsets = queen_xy[:, None, :] - th_xy[None, :, :]
+                closest = (offsets * offsets).sum(axis=2).argmin(axis=1)
+                for queen, index in zip(inject_queens, closest):
+                    queen(_INJECT, self.townhalls[int(index)])
 
     def add_production_pause(
         self,
@@ -436,8 +528,34 @@ class CompetitiveBot(BotAI):
         Args:
             unit: The newly created unit
         """
+        self._tag_types[unit.tag] = unit.type_id
+        if unit.type_id not in self.EXCLUDED_ARMY_TYPES:
+            self._army_count += 1
         await self.unit_manager.on_unit_created(unit)
 
+    async def on_unit_type_changed(self, unit: Unit, previous_type: UnitTypeId):
+        """Handle unit morph events.
+        
+        Args:
+            unit: The unit after morphing
+            previous_type: The unit type before morphing
+        """
+        if previous_type == _ZERGLING:
+            # Morphed zerglings (e.g. banelings) leave the attack status set in place
+            self._attacking_tags.discard(unit.tag)
+        if unit.tag in self._tag_types:
+            self._tag_types[unit.tag] = unit.type_id
+            self._army_count += ((unit.type_id not in self.EXCLUDED_ARMY_TYPES)
+                                 - (previous_type not in self.EXCLUDED_ARMY_TYPES))
+
+    async def on_building_construction_complete(self, unit: Unit):
+        """Handle structure completion events.
+        
+        Args:
+            unit: The completed structure
+        """
+        self._structure_completed = True
+
     async def on_unit_destroyed(self, unit_tag: int):
         """Handle unit destruction events.
         
@@ -445,6 +563,11 @@ class CompetitiveBot(BotAI):
             unit_tag: Tag of the destroyed unit
         """
         self.last_kill_gameloop = self.time
+        self.cleanup.on_unit_destroyed(unit_tag)
+        self._attacking_tags.discard(unit_tag)
+        unit_type = self._tag_types.pop(unit_tag, None)
+        if unit_type is not None and unit_type not in self.EXCLUDED_ARMY_TYPES:
+            self._army_count -= 1
 
     async def on_end(self, result: Result):
         """Called at the end of a game."""
@@ -454,6 +577,10 @@ class CompetitiveBot(BotAI):
         # Record game result with the army supply amount we were targeting
         self.build_strategy.record_game(result == Result.Victory, self.opponent_id, self.current_army_supply)
 
+        # Stats are only written once, after everything for this game is recorded
+        self.stats_manager.flush()
+        self.build_strategy.flush()
+
 class CrawlerBot(BotAI):
     """A StarCraft II bot using python-sc2."""
     
@@ -485,33 +612,41 @@ class CrawlerBot(BotAI):
         # Distribute workers
         await self.distribute_workers()
         
+        # Only await the remaining tasks when their cheap preconditions hold
         # Build workers if we can afford them and need more
-        await self.build_workers()
+        if self._needs_workers():
+            await self.build_workers()
         
         # Build supply depots when needed
-        await self.build_supply()
+        if self._needs_supply():
+            await self.build_supply()
         
         # Expand when possible
-        await self.expand()
+        if self._wants_expansion():
+            await self.expand()
+    
+    def _needs_workers(self) -> bool:
+        """Check if we are below the worker target and have supply for more."""
+        return len(self.workers) < self.townhalls.amount * 22 and self.supply_left > 0
+    
+    def _needs_supply(self) -> bool:
+        """Check if we are close to supply blocked with no depot on the way."""
+        return self.supply_left < 5 and not self.already_pending(UnitTypeId.SUPPLYDEPOT)
+    
+    def _wants_expansion(self) -> bool:
+        """Check if we are below the base target with no command center on the way."""
+        return self.townhalls.amount < 3 and not self.already_pending(UnitTypeId.COMMANDCENTER)
     
     async def build_workers(self) -> None:
         """Build workers if we can afford them and need more."""
-        if (
-            len(self.workers) < self.townhalls.amount * 22
-            and self.can_afford(UnitTypeId.SCV)
-            and self.supply_left > 0
-        ):
+        if self._needs_workers() and self.can_afford(UnitTypeId.SCV):
             for cc in self.townhalls.idle:
                 if self.can_afford(UnitTypeId.SCV):
                     cc.train(UnitTypeId.SCV)
     
     async def build_supply(self) -> None:
         """Build supply depots when needed."""
-        if (
-            self.supply_left < 5
-            and not self.already_pending(UnitTypeId.SUPPLYDEPOT)
-            and self.can_afford(UnitTypeId.SUPPLYDEPOT)
-        ):
+        if self._needs_supply() and self.can_afford(UnitTypeId.SUPPLYDEPOT):
             workers: Units = self.workers.gathering
             if workers:
                 worker: Unit = workers.random
@@ -524,9 +659,5 @@ class CrawlerBot(BotAI):
     
     async def expand(self) -> None:
         """Expand to a new base when resources permit."""
-        if (
-            self.can_afford(UnitTypeId.COMMANDCENTER)
-            and not self.already_pending(UnitTypeId.COMMANDCENTER)
-            and self.townhalls.amount < 3
-        ):
+        if self._wants_expansion() and self.can_afford(UnitTypeId.COMMANDCENTER):
             await self.expand_now()
@@ -1,48 +1,138 @@
 """Builds for the bot to use."""
 from typing import Dict, Optional
+import atexit
+import bisect
 import json
 import os
 from pathlib import Path
 import time
 
+from . import fastjson
+
 class Build:
     """Base class for builds."""
     DEFAULT_ARMY_AMOUNT: int = 10
     NAME: str = "Base Build"
+    SUPPLY_AMOUNTS = range(10, 55, 5)  # Army amounts a build can use, one history bucket each
+    # 2: supply_history stored as parallel supplies/wins/losses lists
+    # 3: supply_history stored as wins/losses lists with one bucket per SUPPLY_AMOUNTS entry
+    SCHEMA_VERSION: int = 3
+    STATS_FILE: Path = Path(__file__).resolve().parent.parent / "data" / "build_stats.json"
+    _dir_ensured: bool = False  # Whether the data directory was created by this process
+    
+    # Parsed stats shared by all builds, reused while the file is unchanged
+    _STATS_CACHE: Optional[Dict] = None
+    _STATS_MTIME: float = 0.0
     
     def __init__(self, name: str):
         self.name = name
         self._stats = self._load_stats()
+        self._supply_stats_cache: Dict[tuple, tuple] = {}  # (opponent_id, army_supply) -> stats
+        self._losses_cache: Dict[str, int] = {}  # opponent_id -> total losses
+        self._dirty = False  # Unsaved changes, written out by flush()
+        atexit.register(self.flush)  # Don't lose changes if the game ends without on_end
         if self.name not in self._stats:
             self._stats[self.name] = {
                 "opponent_history": {}  # Track results and army amounts per opponent
             }
-            self._save_stats()
+            self._dirty = True
+        if self._stats.get("_schema_version", 1) < self.SCHEMA_VERSION:
+            self._migrate_supply_history()
+        self._totals = self._count_totals()  # Running totals, kept up to date by record_game
+            
+    def _migrate_supply_history(self):
+        """Convert supply_history from any older layout to fixed buckets, for every build."""
+        for build_name, build_stats in self._stats.items():
+            if build_name == "_schema_version":
+                continue
+            for opponent_stats in build_stats["opponent_history"].values():
+                old_history = opponent_stats.get("supply_history", {})
+                if isinstance(old_history.get("wins"), list) and "supplies" not in old_history:
+                    continue  # Already in the current layout
+                if "supplies" in old_history:
+                    # Version 2, parallel lists
+                    records = zip(old_history["supplies"], old_history["wins"], old_history["losses"])
+                else:
+                    # Version 1, a dict per supply keyed by the supply as a string
+                    records = ((int(key), value["wins"], value["losses"]) for key, value in old_history.items())
+                history = self._new_supply_history()
+                for army_supply, wins, losses in records:
+                    index = self._nearest_supply_index(army_supply)
+                    if army_supply not in self.SUPPLY_AMOUNTS:
+                        print(f"Moving {build_name} results at army supply {army_supply} "
+                              f"into the {self.SUPPLY_AMOUNTS[index]} supply bucket")
+                    history["wins"][index] += wins
+                    history["losses"][index] += losses
+                opponent_stats["supply_history"] = history
+        self._stats["_schema_version"] = self.SCHEMA_VERSION
+        self._dirty = True
+        
+    @classmethod
+    def _new_supply_history(cls) -> Dict:
+        """Get an empty supply history, with one wins and losses bucket per army amount."""
+        return {"wins": [0] * len(cls.SUPPLY_AMOUNTS), "losses": [0] * len(cls.SUPPLY_AMOUNTS)}
+        
+    @classmethod
+    def _supply_index(cls, army_supply: int) -> Optional[int]:
+        """Get the history bucket of an army supply, or None if it is not one of SUPPLY_AMOUNTS."""
+        if army_supply in cls.SUPPLY_AMOUNTS:
+            return (army_supply - cls.SUPPLY_AMOUNTS.start) // cls.SUPPLY_AMOUNTS.step
+        return None
+        
+    @classmethod
+    def _nearest_supply_index(cls, army_supply: int) -> int:
+        """Get the history bucket of the SUPPLY_AMOUNTS entry closest to an army supply."""
+        index = round((army_supply - cls.SUPPLY_AMOUNTS.start) / cls.SUPPLY_AMOUNTS.step)
+        return min(max(index, 0), len(cls.SUPPLY_AMOUNTS) - 1)
+            
+    def _is_exhausted(self, supply_history: Dict, army_supply: int) -> bool:
+        """Check whether an army supply has lost 3+ times with no wins."""
+        index = self._supply_index(army_supply)
+        if index is None:
+            return False
+        return supply_history["losses"][index] >= 3 and supply_history["wins"][index] == 0
         
     def _get_stats_file(self) -> Path:
         """Get the path to the stats file."""
-        return Path(__file__).parent.parent / "data" / "build_stats.json"
+        return self.STATS_FILE
         
     def _load_stats(self) -> Dict:
         """Load build statistics from file."""
         stats_file = self._get_stats_file()
-        if not stats_file.parent.exists():
-            stats_file.parent.mkdir(parents=True)
+        if not Build._dir_ensured:
+            stats_file.parent.mkdir(parents=True, exist_ok=True)
+            Build._dir_ensured = True
             
-        if not stats_file.exists():
+        try:
+            mtime = os.stat(stats_file).st_mtime
+        except FileNotFoundError:
             return {}
             
+        if Build._STATS_CACHE is not None and mtime == Build._STATS_MTIME:
+            return Build._STATS_CACHE
+            
         try:
-            with open(stats_file, "r") as f:
-                return json.load(f)
+            with open(stats_file, "rb") as f:
+                stats = fastjson.loads(f.read())
         except json.JSONDecodeError:
             return {}
+        Build._STATS_CACHE = stats
+        Build._STATS_MTIME = mtime
+        return stats
             
     def _save_stats(self):
         """Save build statistics to file."""
         stats_file = self._get_stats_file()
-        with open(stats_file, "w") as f:
-            json.dump(self._stats, f, indent=2)
+        with open(stats_file, "wb") as f:
+            f.write(fastjson.dumps(self._stats))
+        Build._STATS_CACHE = self._stats
+        Build._STATS_MTIME = os.stat(stats_file).st_mtime
+        self._dirty = False
+        
+    def flush(self):
+        """Save build statistics if they changed since the last save."""
+        if self._dirty:
+            self._save_stats()
             
     def _find_next_valid_amount(self, opponent_stats: dict, current_amount: int) -> int:
         """Find the next army amount that hasn't lost 3+ times with no wins.
@@ -54,50 +144,22 @@ class Build:
         Returns:
             Next valid army amount, or DEFAULT_ARMY_AMOUNT if all amounts have lost 3+ times
         """
-        # Try each possible amount from current+5 to 50
-        for amount in range(current_amount + 5, 55, 5):
-            if amount > 50:
-                break
-                
-            supply_key = str(amount)
-            if supply_key not in opponent_stats["supply_history"]:
-                return amount  # This amount hasn't been tried yet
-                
-            supply_stats = opponent_stats["supply_history"][supply_key]
-            if supply_stats["losses"] < 3 or supply_stats["wins"] > 0:
-                return amount  # This amount hasn't lost 3+ times or has at least 1 win
-                
-        # Check if all amounts from 10 to 50 have lost 3+ times with no wins
-        all_lost = True
-        for amount in range(10, 55, 5):
-            if amount > 50:
-                break
-                
-            supply_key = str(amount)
-            if supply_key not in opponent_stats["supply_history"]:
-                all_lost = False
-                break
-                
-            supply_stats = opponent_stats["supply_history"][supply_key]
-            if supply_stats["losses"] < 3 or supply_stats["wins"] > 0:
-                all_lost = False
-                break
-                
-        # If all amounts have lost 3+ times with no wins, reset to default
-        if all_lost:
+        supply_history = opponent_stats["supply_history"]
+        
+        # One pass over the amounts from 10 to 50 that haven't lost 3+ times with no wins
+        viable = [
+            amount for amount in self.SUPPLY_AMOUNTS
+            if not self._is_exhausted(supply_history, amount)
+        ]
+        if not viable:
             return self.DEFAULT_ARMY_AMOUNT
             
-        # Otherwise, wrap around to the first valid amount from 10
-        for amount in range(10, current_amount, 5):
-            supply_key = str(amount)
-            if supply_key not in opponent_stats["supply_history"]:
-                return amount
-                
-            supply_stats = opponent_stats["supply_history"][supply_key]
-            if supply_stats["losses"] < 3 or supply_stats["wins"] > 0:
-                return amount
-                
-        # Should never get here since we checked all_lost above
+        # Take the next viable amount above the current one, wrapping around to the lowest
+        index = bisect.bisect_right(viable, current_amount)
+        if index < len(viable):
+            return viable[index]
+        if viable[0] < current_amount:
+            return viable[0]
         return self.DEFAULT_ARMY_AMOUNT
 
     def record_game(self, won: bool, opponent_id: str, army_supply: int):
@@ -108,38 +170,30 @@ class Build:
             opponent_id: ID of the opponent
             army_supply: The army supply amount used in this game
         """
-        if self.name not in self._stats:
-            self._stats[self.name] = {"opponent_history": {}}
-            
-        if opponent_id not in self._stats[self.name]["opponent_history"]:
-            self._stats[self.name]["opponent_history"][opponent_id] = {
-                "army_amount": self.DEFAULT_ARMY_AMOUNT,
-                "last_result": None,
-                "last_army_amount": None,
-                "timestamp": None,
-                "supply_history": {}
-            }
-            
-        opponent_stats = self._stats[self.name]["opponent_history"][opponent_id]
+        build_stats = self._stats.setdefault(self.name, {"opponent_history": {}})
+        opponent_stats = build_stats["opponent_history"].setdefault(opponent_id, {
+            "army_amount": self.DEFAULT_ARMY_AMOUNT,
+            "last_result": None,
+            "last_army_amount": None,
+            "timestamp": None,
+            "supply_history": self._new_supply_history()
+        })
         
-        # Initialize supply history for this amount if needed
-        supply_key = str(army_supply)
-        if supply_key not in opponent_stats["supply_history"]:
-            opponent_stats["supply_history"][supply_key] = {
-                "wins": 0,
-                "losses": 0
-            }
-            
-        # Update supply history
+        # Update supply history, amounts outside SUPPLY_AMOUNTS count toward the closest bucket
+        supply_history = opponent_stats["supply_history"]
+        index = self._nearest_supply_index(army_supply)
+        if army_supply not in self.SUPPLY_AMOUNTS:
+            print(f"Recording army supply {army_supply} in the {self.SUPPLY_AMOUNTS[index]} supply bucket")
         if won:
-            opponent_stats["supply_history"][supply_key]["wins"] += 1
+            supply_history["wins"][index] += 1
+            self._totals["wins"] += 1
             # Keep the same army amount after a win
         else:
-            opponent_stats["supply_history"][supply_key]["losses"] += 1
+            supply_history["losses"][index] += 1
+            self._totals["losses"] += 1
             
             # Check if we've lost too many times at this supply
-            supply_stats = opponent_stats["supply_history"][supply_key]
-            if supply_stats["losses"] >= 3 and supply_stats["wins"] == 0:
+            if self._is_exhausted(supply_history, army_supply):
                 # Find next valid amount
                 opponent_stats["army_amount"] = self._find_next_valid_amount(opponent_stats, army_supply)
             else:
@@ -150,9 +204,13 @@ class Build:
         opponent_stats["last_result"] = "won" if won else "lost"
         opponent_stats["last_army_amount"] = army_supply
         opponent_stats["timestamp"] = time.time()
+        self._supply_stats_cache.clear()
+        self._losses_cache.pop(opponent_id, None)
+        self._dirty = True
         
-        # Save stats
-        self._save_stats()
+    def _get_opponent_stats(self, opponent_id: str) -> Optional[Dict]:
+        """Get this build's stats for an opponent, or None if it has not played them."""
+        return self._stats.get(self.name, {}).get("opponent_history", {}).get(opponent_id)
         
     def get_army_amount(self, opponent_id: str) -> int:
         """Get army amount for a specific opponent.
@@ -163,19 +221,18 @@ class Build:
         Returns:
             Current army amount for this opponent
         """
-        # Initialize opponent stats if needed
-        if opponent_id not in self._stats[self.name]["opponent_history"]:
+        opponent_stats = self._get_opponent_stats(opponent_id)
+        if opponent_stats is None:
+            # Initialize opponent stats
             self._stats[self.name]["opponent_history"][opponent_id] = {
                 "army_amount": self.DEFAULT_ARMY_AMOUNT,
                 "last_result": None,
                 "timestamp": None,
-                "supply_history": {}
+                "supply_history": self._new_supply_history()
             }
-            self._save_stats()
+            self._dirty = True
             return self.DEFAULT_ARMY_AMOUNT
             
-        # Get opponent-specific stats and return stored army amount
-        opponent_stats = self._stats[self.name]["opponent_history"][opponent_id]
         return opponent_stats["army_amount"]
         
     def get_total_losses(self, opponent_id: str) -> int:
@@ -187,15 +244,12 @@ class Build:
         Returns:
             Total number of losses
         """
-        if (
-            self.name in self._stats
-            and opponent_id in self._stats[self.name]["opponent_history"]
-        ):
-            return sum(
-                stats["losses"]
-                for stats in self._stats[self.name]["opponent_history"][opponent_id]["supply_history"].values()
-            )
-        return 0
+        if opponent_id not in self._losses_cache:
+            opponent_stats = self._get_opponent_stats(opponent_id)
+            if opponent_stats is None:
+                return 0
+            self._losses_cache[opponent_id] = sum(opponent_stats["supply_history"]["losses"])
+        return self._losses_cache[opponent_id]
         
     def get_build_losses(self, opponent_id: str) -> int:
         """Get number of losses for this specific build against an opponent.
@@ -206,17 +260,8 @@ class Build:
         Returns:
             Total number of losses for this build
         """
-        if (
-            self.name in self._stats
-            and opponent_id in self._stats[self.name]["opponent_history"]
-            and "supply_history" in self._stats[self.name]["opponent_history"][opponent_id]
-        ):
-            opponent_stats = self._stats[self.name]["opponent_history"][opponent_id]
-            total_losses = 0
-            for supply_stats in opponent_stats["supply_history"].values():
-                total_losses += supply_stats["losses"]
-            return total_losses
-        return 0
+        # Supply history is per build, so this is the same total as get_total_losses
+        return self.get_total_losses(opponent_id)
         
     def get_supply_stats(self, opponent_id: str, army_supply: int) -> tuple[int, int, float]:
         """Get win/loss stats for a specific army supply amount.
@@ -228,39 +273,34 @@ class Build:
         Returns:
             Tuple of (wins, losses, winrate)
         """
-        if (
-            self.name in self._stats 
-            and opponent_id in self._stats[self.name]["opponent_history"]
-        ):
-            opponent_stats = self._stats[self.name]["opponent_history"][opponent_id]
-            if "supply_history" in opponent_stats:
-                supply_key = str(army_supply)
-                if supply_key in opponent_stats["supply_history"]:
-                    stats = opponent_stats["supply_history"][supply_key]
-                    wins = stats["wins"]
-                    losses = stats["losses"]
-                    total = wins + losses
-                    winrate = (wins / total * 100) if total > 0 else 0
-                    return wins, losses, winrate
+        key = (opponent_id, army_supply)
+        if key not in self._supply_stats_cache:
+            self._supply_stats_cache[key] = self._compute_supply_stats(opponent_id, army_supply)
+        return self._supply_stats_cache[key]
+        
+    def _compute_supply_stats(self, opponent_id: str, army_supply: int) -> tuple[int, int, float]:
+        """Compute win/loss stats for a specific army supply amount from the loaded stats."""
+        opponent_stats = self._get_opponent_stats(opponent_id)
+        if opponent_stats is not None:
+            supply_history = opponent_stats.get("supply_history", self._new_supply_history())
+            index = self._supply_index(army_supply)
+            if index is not None:
+                wins = supply_history["wins"][index]
+                losses = supply_history["losses"][index]
+                total = wins + losses
+                winrate = (wins / total * 100) if total > 0 else 0
+                return wins, losses, winrate
         return 0, 0, 0  # Return zeros if no stats found for this supply amount
         
     def get_last_game_result(self, opponent_id: str) -> Optional[str]:
         """Get the result of the last game against this opponent."""
-        if (
-            self.name in self._stats 
-            and opponent_id in self._stats[self.name]["opponent_history"]
-        ):
-            return self._stats[self.name]["opponent_history"][opponent_id]["last_result"]
-        return None
+        opponent_stats = self._get_opponent_stats(opponent_id)
+        return opponent_stats["last_result"] if opponent_stats is not None else None
         
     def get_last_army_amount(self, opponent_id: str) -> Optional[int]:
         """Get the army amount used in the last game against this opponent."""
-        if (
-            self.name in self._stats 
-            and opponent_id in self._stats[self.name]["opponent_history"]
-        ):
-            return self._stats[self.name]["opponent_history"][opponent_id].get("last_army_amount")
-        return None
+        opponent_stats = self._get_opponent_stats(opponent_id)
+        return opponent_stats.get("last_army_amount") if opponent_stats is not None else None
         
     def get_status_text(self) -> str:
         """Get status text for the build."""
@@ -269,16 +309,15 @@ class Build:
     @property
     def stats(self) -> Dict:
         """Get overall build statistics."""
-        if self.name not in self._stats:
-            return {"wins": 0, "losses": 0}
-            
-        # Calculate total wins/losses across all opponents
+        return dict(self._totals)
+        
+    def _count_totals(self) -> Dict[str, int]:
+        """Count total wins/losses across all opponents from the loaded stats."""
         total_wins = 0
         total_losses = 0
         for opponent_stats in self._stats[self.name]["opponent_history"].values():
-            for supply_stats in opponent_stats["supply_history"].values():
-                total_wins += supply_stats["wins"]
-                total_losses += supply_stats["losses"]
+            total_wins += sum(opponent_stats["supply_history"]["wins"])
+            total_losses += sum(opponent_stats["supply_history"]["losses"])
             
         return {"wins": total_wins, "losses": total_losses}
         
@@ -321,6 +360,15 @@ class StandardBuild(Build):
 
 # Add more build classes here as we create them
 
+# Builds selectable by name
+_BUILDS: Dict[str, type] = {
+    "Dynamic ling build": DynamicLingBuild,
+    "Standard": StandardBuild
+}
+
+# One instance per build class, so stats are only loaded the first time a build is requested
+_BUILD_SINGLETONS: Dict[type, Build] = {}
+
 def get_build(name: Optional[str] = None) -> Build:
     """Get a build by name, or return the default build if no name provided.
     
@@ -328,19 +376,16 @@ def get_build(name: Optional[str] = None) -> Build:
         name: Name of the build to get
         
     Returns:
-        Build instance
+        Build instance, shared by every caller asking for the same build
     """
     if name is None:
-        return DynamicLingBuild()
-        
-    builds = {
-        "Dynamic ling build": DynamicLingBuild,
-        "Standard": StandardBuild
-    }
-    
-    build_class = builds.get(name)
-    if build_class is None:
-        print(f"Unknown build {name}, using default build")
-        return DynamicLingBuild()
-        
-    return build_class()
+        build_class = DynamicLingBuild
+    else:
+        build_class = _BUILDS.get(name)
+        if build_class is None:
+            print(f"Unknown build {name}, using default build")
+            build_class = DynamicLingBuild
+            
+    if build_class not in _BUILD_SINGLETONS:
+        _BUILD_SINGLETONS[build_class] = build_class()
+    return _BUILD_SINGLETONS[build_class]
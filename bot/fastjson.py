@@ -0,0 +1,37 @@
+"""JSON helpers that use orjson when it is installed and fall back to the stdlib."""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib is used without it
+    orjson = None
+
+
+def loads(data: bytes) -> Any:
+    """Parse JSON bytes.
+
+    Args:
+        data: The raw file contents
+
+    Returns:
+        The parsed object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize an object to compact JSON bytes.
+
+    Args:
+        obj: The object to serialize
+
+    Returns:
+        The encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
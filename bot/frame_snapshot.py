@@ -0,0 +1,33 @@
+"""Module for snapshotting worker and mineral positions once per game step."""
+
+import numpy as np
+
+
+class FrameSnapshot:
+    """Worker and mineral positions and tags as arrays, shared by the bot and its managers."""
+
+    def __init__(self, bot_instance):
+        """Initialize the frame snapshot.
+
+        Args:
+            bot_instance: The main bot instance
+        """
+        self.bot = bot_instance
+        self.game_loop = -1  # Game loop the arrays were taken on
+        self.worker_pos = np.empty((0, 2), dtype=np.float32)
+        self.worker_tags = np.empty(0, dtype=np.uint64)
+        self.mineral_pos = np.empty((0, 2), dtype=np.float32)
+
+    def update(self) -> None:
+        """Take the arrays from the current units. Call once at the start of each step."""
+        workers = self.bot.workers
+        minerals = self.bot.mineral_field
+        self.worker_pos = np.array([w.position for w in workers], dtype=np.float32).reshape(-1, 2)
+        self.worker_tags = np.array([w.tag for w in workers], dtype=np.uint64)
+        self.mineral_pos = np.array([m.position for m in minerals], dtype=np.float32).reshape(-1, 2)
+        self.game_loop = self.bot.state.game_loop
+
+    @property
+    def is_current(self) -> bool:
+        """Whether the arrays were taken on this game loop, in self.workers and self.mineral_field order."""
+        return self.game_loop == self.bot.state.game_loop
@@ -1,7 +1,8 @@
 """Module for managing unit production and pauses."""
 
-import time
-from typing import Dict, List, Optional, Union
+import heapq
+import itertools
+from typing import Dict, List, Optional, Tuple
 
 from sc2.ids.unit_typeid import UnitTypeId
 
@@ -16,7 +17,9 @@ class ProductionManager:
             bot_instance: The main bot instance
         """
         self.bot = bot_instance
-        self.production_pauses: Dict[UnitTypeId, List[Dict]] = {}
+        # Per unit type, a heap of (end_time, sequence, pause_info) ordered by end time
+        self.production_pauses: Dict[UnitTypeId, List[Tuple[float, int, Dict]]] = {}
+        self._pause_sequence = itertools.count()  # Tie-breaker so pause dicts are never compared
 
     def add_production_pause(
         self,
@@ -33,10 +36,6 @@ class ProductionManager:
         """
         current_game_time = self.bot.time
         
-        # Initialize list of pauses for this unit type if it doesn't exist
-        if unit_type not in self.production_pauses:
-            self.production_pauses[unit_type] = []
-            
         # Add the new pause condition
         pause_info = {}
         if duration_seconds:
@@ -47,7 +46,24 @@ class ProductionManager:
         if until_structure:
             pause_info['wait_for_structure'] = until_structure
             
-        self.production_pauses[unit_type].append(pause_info)
+        heapq.heappush(
+            self.production_pauses.setdefault(unit_type, []),
+            (pause_info['end_time'], next(self._pause_sequence), pause_info)
+        )
+
+    def has_indefinite_pause(self, unit_type: UnitTypeId) -> bool:
+        """Check if a unit type has a pause that only ends when it is removed.
+        
+        Args:
+            unit_type: The unit type to check
+            
+        Returns:
+            True if there is a pause with no end time and no structure to wait for
+        """
+        return any(
+            end_time == float('inf') and 'wait_for_structure' not in pause_info
+            for end_time, _, pause_info in self.production_pauses.get(unit_type, ())
+        )
 
     def is_production_paused(self, unit_type: UnitTypeId) -> bool:
         """Check if production is paused for a unit type.
@@ -58,28 +74,33 @@ class ProductionManager:
         Returns:
             True if production is paused, False otherwise
         """
-        if unit_type not in self.production_pauses:
+        if not self.production_pauses:
+            return False  # Common case, no pauses for any unit type
+            
+        pauses = self.production_pauses.get(unit_type)
+        if pauses is None:
             return False
         
+        # Expired pauses sit at the front of the heap
         current_game_time = self.bot.time
-        pauses = self.production_pauses[unit_type]
-        
-        # Remove any expired pauses and check if any are still active
-        active_pauses = []
-        for pause in pauses:
-            if current_game_time < pause['end_time']:
-                # Check for structure requirement if it exists
-                if 'wait_for_structure' in pause:
-                    if not self.bot.structures(pause['wait_for_structure']).ready.exists:
-                        active_pauses.append(pause)
-                else:
-                    active_pauses.append(pause)
+        while pauses and pauses[0][0] <= current_game_time:
+            heapq.heappop(pauses)
+            
+        # Drop pauses whose required structure has finished, swap-removing in place
+        removed = False
+        for i in range(len(pauses) - 1, -1, -1):
+            pause_info = pauses[i][2]
+            if ('wait_for_structure' in pause_info and
+                self.bot.structures(pause_info['wait_for_structure']).ready.exists):
+                pauses[i] = pauses[-1]
+                pauses.pop()
+                removed = True
+        if removed:
+            heapq.heapify(pauses)
                 
-        if not active_pauses:
+        if not pauses:
             # All pauses expired
             del self.production_pauses[unit_type]
             return False
             
-        # Update the list with only active pauses
-        self.production_pauses[unit_type] = active_pauses
         return True
@@ -1,13 +1,14 @@
 """Module for managing game statistics and opponent data."""
 
 import csv
-import json
 import os
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from sc2.data import Result
 
+from .. import fastjson
+
 
 class StatsManager:
     """Manages game statistics and opponent data."""
@@ -24,6 +25,8 @@ class StatsManager:
         self.stats_file = os.path.join(self.stats_dir, "opponent_stats.json")
         self.history_file = os.path.join(self.stats_dir, "match_history.csv")
         self.opponent_stats = {}
+        self._stats_dirty = False  # Unsaved changes, written out by flush()
+        self._pending_history_rows: List[list] = []  # Match rows not yet in the CSV file
         
         # Create data directory if it doesn't exist
         os.makedirs(self.stats_dir, exist_ok=True)
@@ -38,21 +41,48 @@ class StatsManager:
             Dict containing opponent statistics
         """
         if os.path.exists(self.stats_file):
-            with open(self.stats_file, 'r') as f:
-                return json.load(f)
+            with open(self.stats_file, 'rb') as f:
+                return fastjson.loads(f.read())
         return {}
 
     def save_opponent_stats(self) -> None:
-        """Save opponent statistics to JSON file."""
-        with open(self.stats_file, 'w') as f:
-            json.dump(self.opponent_stats, f, indent=2)
+        """Save opponent statistics to JSON file.
+
+        The stats are written to a temporary file that then replaces the old one,
+        so a crash mid-write never leaves a truncated stats file behind.
+        """
+        tmp_file = self.stats_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(fastjson.dumps(self.opponent_stats))
+        os.replace(tmp_file, self.stats_file)
+        self._stats_dirty = False
+
+    def flush(self) -> None:
+        """Save opponent statistics if they changed, and append any queued match history."""
+        if self._stats_dirty:
+            self.save_opponent_stats()
+        if self._pending_history_rows:
+            self._write_match_history()
 
     def log_match_history(self, result: Result) -> None:
-        """Log match details to CSV file.
+        """Queue match details for the CSV file, written out by flush().
         
         Args:
             result: The game result (Victory, Defeat, or Tie)
         """
+        self._pending_history_rows.append([
+            datetime.now().isoformat(),
+            self.bot.opponent_id,
+            self.bot.opponent_name or "Unknown",
+            self.bot.enemy_race,
+            self.bot.game_info.map_name,
+            result.name,
+            int(self.bot.time - self.bot.start_time),
+            self.bot.totalattacks
+        ])
+
+    def _write_match_history(self) -> None:
+        """Append all queued match rows to the CSV file in one write."""
         write_header = not os.path.exists(self.history_file)
         
         with open(self.history_file, 'a', newline='') as f:
@@ -68,17 +98,8 @@ class StatsManager:
                     'game_duration_seconds',
                     'total_attacks'
                 ])
-            
-            writer.writerow([
-                datetime.now().isoformat(),
-                self.bot.opponent_id,
-                self.bot.opponent_name or "Unknown",
-                self.bot.enemy_race,
-                self.bot.game_info.map_name,
-                result.name,
-                int(self.bot.time - self.bot.start_time),
-                self.bot.totalattacks
-            ])
+            writer.writerows(self._pending_history_rows)
+        self._pending_history_rows = []
 
     def update_opponent_stats(self, result: Result) -> None:
         """Update opponent statistics.
@@ -86,15 +107,12 @@ class StatsManager:
         Args:
             result: The game result (Victory, Defeat, or Tie)
         """
-        if self.bot.opponent_id not in self.opponent_stats:
-            self.opponent_stats[self.bot.opponent_id] = {
-                "name": self.bot.opponent_name or "Unknown",
-                "wins": 0,
-                "losses": 0,
-                "ties": 0
-            }
-        
-        stats = self.opponent_stats[self.bot.opponent_id]
+        stats = self.opponent_stats.setdefault(self.bot.opponent_id, {
+            "name": self.bot.opponent_name or "Unknown",
+            "wins": 0,
+            "losses": 0,
+            "ties": 0
+        })
         if result == Result.Victory:
             stats["wins"] += 1
         elif result == Result.Defeat:
@@ -103,7 +121,7 @@ class StatsManager:
             stats["ties"] += 1
             
         stats["name"] = self.bot.opponent_name or "Unknown"
-        self.save_opponent_stats()
+        self._stats_dirty = True
 
     def get_opponent_summary(self) -> str:
         """Get a summary of opponent statistics.
@@ -1,7 +1,10 @@
 """Module for managing unit creation and control."""
 
+from collections import Counter
 from typing import Optional
 
+import numpy as np
+
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.position import Point2
 from sc2.unit import Unit
@@ -73,19 +76,22 @@ class UnitManager:
         Args:
             drone: The drone to assign
         """
-        # Try to find minerals at any base
-        for base in sorted(
-            self.bot.townhalls,
-            key=lambda th: drone.distance_to(th.position)
-        ):
+        townhalls = self.bot.townhalls
+        if not townhalls:
+            return
+        
+        # Try to find minerals at any base, nearest first; squared distances from one
+        # array keep the order without a distance_to call per base
+        townhall_pos = np.array([th.position for th in townhalls], dtype=np.float32)
+        diff = townhall_pos - np.array(drone.position, dtype=np.float32)
+        for index in np.argsort(np.einsum("ij,ij->i", diff, diff), kind="stable"):
+            base = townhalls[int(index)]
             mineral_fields = self.bot.mineral_field.closer_than(10, base)
             if mineral_fields:
-                # Find mineral field with fewest workers
-                target = min(
-                    mineral_fields,
-                    key=lambda mf: len(self.bot.workers.filter(
-                        lambda w: w.is_gathering and w.order_target == mf.tag
-                    ))
+                # Find mineral field with fewest workers, counting all gatherers in one pass
+                gatherers = Counter(
+                    w.order_target for w in self.bot.workers if w.is_gathering
                 )
+                target = min(mineral_fields, key=lambda mf: gatherers[mf.tag])
                 drone.gather(target)
                 break  # Stop once we've found a valid mineral field
@@ -1,13 +1,22 @@
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.ability_id import AbilityId
 from sc2.position import Point2
-import time
+from sc2.units import Units
 import math
+import numpy as np
+
+_COMBAT_TYPES = (UnitTypeId.ZERGLING, UnitTypeId.MUTALISK)
+_UNSET = object()  # Marks a per-step cache entry as not computed yet
 
 class Cleanup:
+    # Search grids by (map name, grid spacing), kept for later games in the same process
+    _GRID_CACHE = {}
+    BUILD_COOLDOWN_S: float = 30.0  # Game seconds between attempts at the same tech structure
+    EARLIEST_CLEANUP_S: float = 300.0  # Game time before which cleanup mode never starts
+
     def __init__(self, bot_ai):
         self.ai = bot_ai
-        self.last_drone_time = 0
+        self.last_drone_time = -math.inf  # Allow a drone on the very first step
         self.last_attack_time = 0
         self.current_base_index = None
         self.cleanup_mode_active = False
@@ -18,9 +27,16 @@ class Cleanup:
         self.corner_attack_started = False
         self.last_corner_time = 0
         self.current_corner = 0
+        map_width, map_height = self.ai.game_info.map_size
+        self.map_corners = [
+            Point2((0, 0)),
+            Point2((map_width, 0)),
+            Point2((0, map_height)),
+            Point2((map_width, map_height))
+        ]
         
         # Grid search variables
-        self.grid_positions = []
+        self.grid_positions = np.empty((0, 2), dtype=np.int16)  # (x, y) rows
         self.current_muta_target = 0
         self.current_ling_target = 0
         self.grid_spacing = 8
@@ -34,17 +50,11 @@ class Cleanup:
         self.last_pool_attempt = 0
         self.last_lair_attempt = 0
         self.last_spire_attempt = 0
-        self.build_cooldowns = {
-            UnitTypeId.EXTRACTOR: 30,
-            UnitTypeId.SPAWNINGPOOL: 30,
-            UnitTypeId.LAIR: 30,
-            UnitTypeId.SPIRE: 30
-        }
         
         # Attack tracking
         self.last_cleanup_check = 0
         self.cleanup_check_interval = 2
-        self.last_enemy_kill_time = 0
+        self.last_enemy_kill_time = 0  # Updated by on_unit_destroyed
         self.last_enemy_kill_value = 0
         
         # Unit caps and timings
@@ -57,10 +67,17 @@ class Cleanup:
         self.active_threat_start_time = 0
         self.last_enemy_sighting = 0
         self.last_attack_command = 0
+        
+        # Per-step lookups, cached for the game loop in _cache_loop
+        self._cache_loop = -1
+        self._cached_closest_building = _UNSET
+        self._cached_ground_units = None
+        self._cached_combat_units = None
+        self._cached_structures = None
 
     async def continue_building_drones(self):
         """Keep building drones during cleanup phase."""
-        current_time = time.time()
+        current_time = self.ai.time
         if (self.ai.supply_workers < 13 and 
             self.ai.can_afford(UnitTypeId.DRONE) and 
             self.ai.larva and 
@@ -70,45 +87,110 @@ class Cleanup:
     
     def initialize_grid(self):
         """Create a grid of positions for units to systematically search."""
-        if not self.grid_positions:
+        if not len(self.grid_positions):
+            cache_key = (self.ai.game_info.map_name, self.grid_spacing)
+            cached = Cleanup._GRID_CACHE.get(cache_key)
+            if cached is not None:
+                self.grid_positions = cached
+                return
             # Get playable area bounds
             p_area = self.ai.game_info.playable_area
-            # Create grid of points
-            for x in range(p_area.x, p_area.x + p_area.width, self.grid_spacing):
-                for y in range(p_area.y, p_area.y + p_area.height, self.grid_spacing):
-                    pos = Point2((x, y))
-                    # Only add if position is pathable
-                    if self.ai.in_pathing_grid(pos):
-                        self.grid_positions.append(pos)
-            print(f"Initialized search grid with {len(self.grid_positions)} positions")
+            # Sample the pathing grid every grid_spacing cells; transposed so the
+            # positions come out x-major like a nested x/y loop would produce
+            pathing = self.ai.game_info.pathing_grid.data_numpy
+            sampled = pathing[
+                p_area.y:p_area.y + p_area.height:self.grid_spacing,
+                p_area.x:p_area.x + p_area.width:self.grid_spacing,
+            ].T
+            xs, ys = np.nonzero(sampled == 1)
+            self.grid_positions = np.stack(
+                [xs * self.grid_spacing + p_area.x, ys * self.grid_spacing + p_area.y], axis=1
+            ).astype(np.int16)
+            if len(self.grid_positions):
+                Cleanup._GRID_CACHE[cache_key] = self.grid_positions
+            if __debug__:
+                print(f"Initialized search grid with {len(self.grid_positions)} positions")
     
     def initialize_base_search(self):
         """Initialize the base-by-base search pattern starting from enemy base."""
         if not self.base_positions:
             # Start with enemy main base
-            self.base_positions = [self.ai.enemy_start_locations[0]]
-            # Add all possible base locations, sorted by distance from enemy main
-            expansion_locs = list(self.ai.expansion_locations.keys())
-            sorted_expansions = sorted(expansion_locs, 
-                                    key=lambda x: x.distance_to(self.ai.enemy_start_locations[0]))
-            self.base_positions.extend(sorted_expansions)
-            print(f"Initialized base search with {len(self.base_positions)} bases")
+            enemy_main = self.ai.enemy_start_locations[0]
+            self.base_positions = [enemy_main]
+            # Add all possible base locations, sorted by (squared) distance from enemy main
+            expansion_locs = self.ai.expansion_locations_list
+            diff = np.array(expansion_locs, dtype=float).reshape(-1, 2) - np.array(enemy_main, dtype=float)
+            order = np.argsort(np.einsum("ij,ij->i", diff, diff), kind="stable")
+            self.base_positions.extend(expansion_locs[int(i)] for i in order)
+            if __debug__:
+                print(f"Initialized base search with {len(self.base_positions)} bases")
+            
+    def _refresh_step_cache(self):
+        """Drop the cached per-step lookups once the game loop has advanced."""
+        game_loop = self.ai.state.game_loop
+        if self._cache_loop != game_loop:
+            self._cache_loop = game_loop
+            self._cached_closest_building = _UNSET
+            self._cached_ground_units = None
+            self._cached_combat_units = None
+            self._cached_structures = None
             
-    def get_visible_enemy_buildings(self):
-        """Get all visible enemy buildings, sorted by distance to our closest unit."""
+    def get_closest_enemy_building(self):
+        """Get the visible enemy building closest to any of our units, or None."""
+        self._refresh_step_cache()
+        if self._cached_closest_building is _UNSET:
+            self._cached_closest_building = self._find_closest_enemy_building()
+        return self._cached_closest_building
+        
+    def _find_closest_enemy_building(self):
+        """Find the visible enemy building closest to any of our units."""
         enemy_structures = self.ai.enemy_structures
         if not enemy_structures or not self.ai.units:
-            return []
+            return None
             
-        # Sort buildings by distance to our closest unit
-        return sorted(
-            enemy_structures,
-            key=lambda structure: min(unit.distance_to(structure) for unit in self.ai.units)
-        )
+        # Squared distance from each building to our closest unit
+        unit_pos = np.array([unit.position for unit in self.ai.units], dtype=np.float32)
+        structure_pos = np.array([s.position for s in enemy_structures], dtype=np.float32)
+        diff = structure_pos[:, None, :] - unit_pos[None, :, :]
+        closest = np.einsum("ijk,ijk->ij", diff, diff).min(axis=1)
+        return enemy_structures[int(closest.argmin())]
         
     def get_visible_enemy_ground_units(self):
         """Get all visible enemy ground units."""
-        return self.ai.enemy_units.filter(lambda unit: not unit.is_flying)
+        self._refresh_step_cache()
+        if self._cached_ground_units is None:
+            self._cached_ground_units = self.ai.enemy_units.filter(lambda unit: not unit.is_flying)
+        return self._cached_ground_units
+        
+    def _combat_units(self):
+        """Get our zerglings and mutalisks, from the unit index once per step."""
+        self._refresh_step_cache()
+        if self._cached_combat_units is None:
+            by_type = self.ai.unit_index.by_type
+            self._cached_combat_units = Units(
+                [unit for unit_type in _COMBAT_TYPES for unit in by_type.get(unit_type, ())],
+                self.ai
+            )
+        return self._cached_combat_units
+        
+    def _structures(self, unit_type):
+        """Get our structures of a type, grouping all structures by type once per step."""
+        self._refresh_step_cache()
+        if self._cached_structures is None:
+            self._cached_structures = {}
+            for structure in self.ai.structures:
+                self._cached_structures.setdefault(structure.type_id, []).append(structure)
+        return Units(self._cached_structures.get(unit_type, ()), self.ai)
+        
+    def _attack(self, units, target):
+        """Order units to attack a position, skipping units whose current attack order already targets it."""
+        for unit in units:
+            # Order positions come back as float32, so match them with a small tolerance
+            order_target = unit.order_target
+            if (unit.is_attacking and isinstance(order_target, Point2) and
+                    order_target.distance_to_point2(target) < 0.1):
+                continue
+            unit.attack(target)
         
     async def handle_active_threats(self):
         """Handle the active threat elimination phase."""
@@ -121,28 +203,24 @@ class Cleanup:
             return
             
         # Get visible threats
-        enemy_buildings = self.get_visible_enemy_buildings()
+        closest_building = self.get_closest_enemy_building()
         enemy_ground_units = self.get_visible_enemy_ground_units()
         
-        if enemy_buildings or enemy_ground_units:
+        if closest_building is not None or enemy_ground_units:
             self.last_enemy_sighting = current_time
             
             # Only issue new attack commands every 10 seconds
             if current_time - self.last_attack_command > 10:
                 # Prioritize attacking buildings
-                if enemy_buildings:
-                    target = enemy_buildings[0]  # Closest building
+                if closest_building is not None:
+                    target = closest_building
                     await self.ai.chat_send(f"[CLEANUP] Attacking enemy building at {target.position}")
                 else:
                     target = enemy_ground_units[0]  # Take first ground unit
                     await self.ai.chat_send(f"[CLEANUP] Attacking enemy ground unit at {target.position}")
                 
                 # Command all combat units to attack
-                combat_units = self.ai.units.filter(
-                    lambda u: u.type_id in {UnitTypeId.ZERGLING, UnitTypeId.MUTALISK}
-                )
-                for unit in combat_units:
-                    unit.attack(target.position)
+                self._attack(self._combat_units(), target.position)
                 
                 self.last_attack_command = current_time
         
@@ -154,10 +232,10 @@ class Cleanup:
     async def handle_base_search(self):
         """Handle the base-by-base search phase."""
         # Check if we found any enemies during base search
-        enemy_buildings = self.get_visible_enemy_buildings()
+        closest_building = self.get_closest_enemy_building()
         enemy_ground_units = self.get_visible_enemy_ground_units()
         
-        if enemy_buildings or enemy_ground_units:
+        if closest_building is not None or enemy_ground_units:
             # Return to active threat phase
             self.cleanup_phase = "active_threats"
             self.active_threat_start_time = self.ai.time
@@ -177,11 +255,7 @@ class Cleanup:
             await self.ai.chat_send(f"[CLEANUP] Searching base location {self.current_base_index + 1}/{len(self.base_positions)}")
             
             # Command all combat units to attack this base location
-            combat_units = self.ai.units.filter(
-                lambda u: u.type_id in {UnitTypeId.ZERGLING, UnitTypeId.MUTALISK}
-            )
-            for unit in combat_units:
-                unit.attack(target)
+            self._attack(self._combat_units(), target)
             
             self.current_base_index += 1
             self.last_attack_command = self.ai.time
@@ -189,10 +263,10 @@ class Cleanup:
     async def handle_grid_search(self):
         """Handle the grid search phase."""
         # Check if we found any enemies during grid search
-        enemy_buildings = self.get_visible_enemy_buildings()
+        closest_building = self.get_closest_enemy_building()
         enemy_ground_units = self.get_visible_enemy_ground_units()
         
-        if enemy_buildings or enemy_ground_units:
+        if closest_building is not None or enemy_ground_units:
             # Return to active threat phase
             self.cleanup_phase = "active_threats"
             self.active_threat_start_time = self.ai.time
@@ -200,20 +274,18 @@ class Cleanup:
             await self.ai.chat_send("[CLEANUP] Found new threats during grid search, returning to active threat phase")
         else:
             # Continue with existing grid search logic
-            if not self.grid_positions:
+            if not len(self.grid_positions):
                 self.initialize_grid()
             
-            if self.grid_positions:
-                if self.ai.units(UnitTypeId.MUTALISK).amount:
-                    target = self.grid_positions[self.current_muta_target]
+            if len(self.grid_positions):
+                if self.ai.unit_index(UnitTypeId.MUTALISK).amount:
+                    target = Point2(self.grid_positions[self.current_muta_target].tolist())
                     self.current_muta_target = (self.current_muta_target + 1) % len(self.grid_positions)
-                    for muta in self.ai.units(UnitTypeId.MUTALISK):
-                        muta.attack(target)
+                    self._attack(self.ai.unit_index(UnitTypeId.MUTALISK), target)
                 else:  # zergling
-                    target = self.grid_positions[self.current_ling_target]
+                    target = Point2(self.grid_positions[self.current_ling_target].tolist())
                     self.current_ling_target = (self.current_ling_target + 1) % len(self.grid_positions)
-                    for ling in self.ai.units(UnitTypeId.ZERGLING):
-                        ling.attack(target)
+                    self._attack(self.ai.unit_index(UnitTypeId.ZERGLING), target)
             else:
                 for unit in self.ai.units:
                     unit.attack(self.ai.game_info.map_center)
@@ -229,7 +301,15 @@ class Cleanup:
             main_base = self.ai.townhalls.first
             
             # Check if we have workers in the main base
-            workers_in_main = self.ai.workers.closer_than(10, main_base)
+            snapshot = self.ai.frame_snapshot
+            if snapshot.is_current:
+                diff = snapshot.worker_pos - np.array(main_base.position, dtype=np.float32)
+                in_main = np.einsum("ij,ij->i", diff, diff) < 100
+                workers_in_main = Units(
+                    [w for w, near in zip(self.ai.workers, in_main) if near], self.ai
+                )
+            else:
+                workers_in_main = self.ai.workers.closer_than(10, main_base)
             if not workers_in_main:
                 return
                 
@@ -237,17 +317,19 @@ class Cleanup:
             geysers = self.ai.vespene_geyser.closer_than(5, main_base)
             if geysers and self.ai.can_afford(UnitTypeId.EXTRACTOR):
                 # Check building cooldown
-                current_time = time.time()
-                if current_time - self.last_extractor_attempt > self.build_cooldowns[UnitTypeId.EXTRACTOR]:
+                current_time = self.ai.time
+                if current_time - self.last_extractor_attempt > self.BUILD_COOLDOWN_S:
                     # Build extractor
                     await self.ai.build(UnitTypeId.EXTRACTOR, geysers.first)
                     self.gas_setup_complete = True
-                    print("Building extractor for tech progression")
+                    if __debug__:
+                        print("Building extractor for tech progression")
                     self.last_extractor_attempt = current_time
                     
                 # Assign 3 workers once extractor is built
-                if self.ai.structures(UnitTypeId.EXTRACTOR).ready:
-                    extractor = self.ai.structures(UnitTypeId.EXTRACTOR).first
+                ready_extractors = self._structures(UnitTypeId.EXTRACTOR).ready
+                if ready_extractors:
+                    extractor = ready_extractors.first
                     if extractor.assigned_harvesters < 3:
                         # Take workers from main base specifically
                         workers = workers_in_main.take(3 - extractor.assigned_harvesters)
@@ -256,120 +338,110 @@ class Cleanup:
     
     async def start_tech_progression(self):
         """Start the tech progression to lair and spire."""
-        current_time = time.time()
+        current_time = self.ai.time
+        pools = self._structures(UnitTypeId.SPAWNINGPOOL)
+        lairs = self._structures(UnitTypeId.LAIR)
+        spires = self._structures(UnitTypeId.SPIRE)
+        ready_lairs = lairs.ready
         
         # Try to build lair if we have spawning pool and resources
         if (not self.tech_progression_started and
-            self.ai.structures(UnitTypeId.SPAWNINGPOOL).ready and 
+            pools.ready and 
             self.ai.can_afford(UnitTypeId.LAIR) and 
-            not self.ai.structures(UnitTypeId.LAIR).amount and 
+            not lairs.amount and 
             not self.ai.already_pending(UnitTypeId.LAIR)):
             
             hq = self.ai.townhalls.first
             if hq:
                 hq.build(UnitTypeId.LAIR)
-                print("Starting Lair construction")
-                self.last_lair_attempt = time.time()
+                if __debug__:
+                    print("Starting Lair construction")
+                self.last_lair_attempt = current_time
                 self.tech_progression_started = True
         
         # Try to build spire if we have lair
         if (self.tech_progression_started and  # Only try after lair has started
-            self.ai.structures(UnitTypeId.LAIR).ready and 
+            ready_lairs and 
             self.ai.can_afford(UnitTypeId.SPIRE) and 
-            not self.ai.structures(UnitTypeId.SPIRE).amount and 
+            not spires.amount and 
             not self.ai.already_pending(UnitTypeId.SPIRE) and
-            current_time - self.last_spire_attempt > self.build_cooldowns[UnitTypeId.SPIRE]):  # Add cooldown check
+            current_time - self.last_spire_attempt > self.BUILD_COOLDOWN_S):  # Add cooldown check
 
-            print(f"Attempting to build Spire - Lair ready: {self.ai.structures(UnitTypeId.LAIR).ready}, Can afford: {self.ai.can_afford(UnitTypeId.SPIRE)}")
+            if __debug__:
+                print(f"Attempting to build Spire - Lair ready: {ready_lairs}, Can afford: {self.ai.can_afford(UnitTypeId.SPIRE)}")
             # Calculate position near our lair
-            spire_position = self.ai.structures(UnitTypeId.LAIR).first.position.towards(self.ai.game_info.map_center, 6)
+            spire_position = lairs.first.position.towards(self.ai.game_info.map_center, 6)
             placement_success = await self.ai.build(UnitTypeId.SPIRE, near=spire_position)
-            print(f"Spire placement success: {placement_success}")
             if placement_success:
-                print("Starting Spire construction")
-                self.last_spire_attempt = time.time()
-            else:
-                print("Failed to place Spire - might be a placement issue")
+                self.last_spire_attempt = current_time
+            if __debug__:
+                print(f"Spire placement success: {placement_success}")
+                if placement_success:
+                    print("Starting Spire construction")
+                else:
+                    print("Failed to place Spire - might be a placement issue")
     
     def start_mutalisk_phase(self):
         """Start mutalisk production and map corner attacks."""
-        if not self.mutalisk_phase_started and self.ai.structures(UnitTypeId.SPIRE).ready:
+        if not self.mutalisk_phase_started and self._structures(UnitTypeId.SPIRE).ready:
             # Start producing mutalisks
             if self.ai.can_afford(UnitTypeId.MUTALISK) and self.ai.larva:
                 self.ai.train(UnitTypeId.MUTALISK)
                 self.mutalisk_phase_started = True
-                print("Starting Mutalisk production")
+                if __debug__:
+                    print("Starting Mutalisk production")
 
     def update_mutalisk_attacks(self):
         """Update mutalisk attack behavior."""
         if self.mutalisk_phase_started:
-            current_time = time.time()
+            current_time = self.ai.time
+            mutas = self.ai.unit_index(UnitTypeId.MUTALISK)
             
             # Check if we should attack corners
-            if not self.corner_attack_started and self.ai.units(UnitTypeId.MUTALISK).amount >= 3:
+            if not self.corner_attack_started and mutas.amount >= 3:
                 self.corner_attack_started = True
-                print("Starting corner attacks with Mutalisks")
+                if __debug__:
+                    print("Starting corner attacks with Mutalisks")
             
             # Update corner attacks
             if self.corner_attack_started and current_time - self.last_corner_time > 30:
-                mutas = self.ai.units(UnitTypeId.MUTALISK)
                 if mutas:
                     # Get next corner to attack
-                    corners = [
-                        Point2((0, 0)),
-                        Point2((self.ai.game_info.map_size[0], 0)),
-                        Point2((0, self.ai.game_info.map_size[1])),
-                        Point2((self.ai.game_info.map_size[0], self.ai.game_info.map_size[1]))
-                    ]
-                    target = corners[self.current_corner]
+                    target = self.map_corners[self.current_corner]
                     
                     # Attack with all mutalisks
-                    for muta in mutas:
-                        muta.attack(target)
+                    self._attack(mutas, target)
                     
                     # Update corner index and time
-                    self.current_corner = (self.current_corner + 1) % 4
+                    self.current_corner = (self.current_corner + 1) % len(self.map_corners)
                     self.last_corner_time = current_time
     
-    def get_ordered_base_locations(self):
-        """Get base locations ordered by distance from enemy main."""
-        enemy_main = self.ai.enemy_start_locations[0]
-        our_main = self.ai.start_location
-        
-        # Sort expansions by distance from enemy main to our main
-        return sorted(
-            list(self.ai.expansion_locations.keys()),  # Convert dict keys to list
-            key=lambda p: (
-                # Primary sort by distance from enemy main
-                p.distance_to(enemy_main),
-                # Secondary sort by distance from our main (for equidistant bases)
-                -p.distance_to(our_main)
-            )
-        )
-
     async def tech_status(self):
         """Check tech status and print debug info."""
         # Only print tech status when we're actually trying to build something
         if self.cleanup_mode_active and self.ai.can_afford(UnitTypeId.LAIR):
-            current_time = time.time()
+            current_time = self.ai.time
             if current_time - self.last_tech_status_time > 30:  # Only print every 30 seconds
-                await self.ai.chat_send(f"Tech status - Lair: {len(self.ai.structures(UnitTypeId.LAIR))}, Spire: {len(self.ai.structures(UnitTypeId.SPIRE))}")
+                await self.ai.chat_send(f"Tech status - Lair: {len(self._structures(UnitTypeId.LAIR))}, Spire: {len(self._structures(UnitTypeId.SPIRE))}")
                 self.last_tech_status_time = current_time
 
+    def on_unit_destroyed(self, unit_tag):
+        """Record the time of our latest kill when a unit death raised our killed-units score."""
+        # Only kills we made count, so expiring MULEs, broodlings etc. don't reset the timer
+        current_kills = self.ai.state.score.killed_value_units
+        if current_kills > self.last_enemy_kill_value:
+            # Kill tracking starts with the cleanup checks, so earlier kills count as made then
+            self.last_enemy_kill_time = max(self.ai.time, self.EARLIEST_CLEANUP_S)
+            self.last_enemy_kill_value = current_kills
+
     async def update(self):
         """Update the cleanup behavior."""
         # Check if we should enter cleanup mode
         if self.cleanup_phase == "inactive":
             # Don't allow cleanup mode before 5 minutes
-            if self.ai.time < 300:
+            if self.ai.time < self.EARLIEST_CLEANUP_S:
                 return
                 
-            # Track when we kill enemy units
-            current_kills = self.ai.state.score.killed_value_units
-            if current_kills > self.last_enemy_kill_value:
-                self.last_enemy_kill_time = self.ai.time
-                self.last_enemy_kill_value = current_kills
-                
             # Enter cleanup mode if we haven't killed any enemy units for 3 minutes
             if self.ai.time - self.last_enemy_kill_time > 180:
                 self.cleanup_mode_active = True
@@ -382,6 +454,12 @@ class Cleanup:
                 self.ai.production_manager.add_production_pause(UnitTypeId.ZERGLING, duration_seconds=self.cleanup_production_pause)
 
         if self.cleanup_mode_active:
+            # The cleanup logic works on multi-second timers, so only run it every
+            # cleanup_check_interval seconds rather than every step
+            if self.ai.time - self.last_cleanup_check < self.cleanup_check_interval:
+                return
+            self.last_cleanup_check = self.ai.time
+            
             # Handle the current cleanup phase
             if self.cleanup_phase == "active_threats":
                 await self.handle_active_threats()
@@ -396,6 +474,4 @@ class Cleanup:
                 await self.start_tech_progression()
                 await self.tech_status()
                 self.start_mutalisk_phase()
-                self.update_mutalisk_attacks()
-
-            await self.continue_building_drones()
\ No newline at end of file
+                self.update_mutalisk_attacks()
\ No newline at end of file
@@ -1,97 +1,156 @@
-from typing import Dict, List, Set
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
 from sc2.position import Point2
 from sc2.ids.ability_id import AbilityId
 from sc2.unit import Unit
 from sc2.units import Units
 import math
-import time
+import numpy as np
+from scipy.spatial import cKDTree
 
 MINING_RADIUS = 1.325
+# Speed mining only steps in between these distances (squared) from the target
+SPEEDMINE_MIN_DIST_SQ = 0.75 ** 2
+SPEEDMINE_MAX_DIST_SQ = 2 ** 2
 
 class SpeedMining:
+    __slots__ = (
+        "ai", "enable_on_return", "enable_on_mine", "mineral_target_dict",
+        "_target_townhalls", "_target_minerals", "last_worker_check", "worker_check_interval",
+        "start_time", "redistribution_delay", "worker_target_counts", "gathering_target_counts",
+        "_mineral_tree", "_minerals_by_tag", "_base_mineral_tags", "_long_distance_options",
+    )
+
     def __init__(self, bot_ai, enable_on_return=True, enable_on_mine=True):
         self.ai = bot_ai
         self.enable_on_return = enable_on_return
         self.enable_on_mine = enable_on_mine
         self.mineral_target_dict: Dict[Point2, Point2] = {}
+        # Townhall tags and mineral tag -> position the targets were last calculated for
+        self._target_townhalls: frozenset = frozenset()
+        self._target_minerals: Dict[int, Point2] = {}
+        # Townhall tag -> tags of its nearby minerals, kept until update_targets sees the bases or minerals change
+        self._base_mineral_tags: Optional[Dict[int, List[int]]] = None
         self.calculate_targets()
-        self.last_worker_check = 0
+        # All in game seconds
+        self.last_worker_check = -math.inf
         self.worker_check_interval = 30  # Check every 30 seconds
-        self.start_time = time.time()
+        self.start_time = self.ai.time
         self.redistribution_delay = 5.0  # Wait 5 seconds before starting redistribution
+        # Workers per order target, and gathering workers per order target, for this step
+        self.worker_target_counts: Counter = Counter()
+        self.gathering_target_counts: Counter = Counter()
+        self._mineral_tree: Optional[cKDTree] = None  # Over mineral_field positions, built lazily per step
+        self._minerals_by_tag: Dict[int, Unit] = {}
+        # Unclaimed expansions with their least busy mineral patch, built lazily per step
+        self._long_distance_options: Optional[List[Tuple[Point2, Unit]]] = None
 
     def get_mineral_workers(self) -> Units:
         """Get all workers that are mining minerals (not gas)."""
-        return self.ai.workers.filter(
-            lambda unit: not unit.is_carrying_vespene and 
-            (unit.order_target is None or 
-             not self.ai.gas_buildings.find_by_tag(unit.order_target))
+        gas_tags = self.ai.gas_buildings.tags
+        return Units(
+            [unit for unit in self.ai.workers
+             if not unit.is_carrying_vespene and unit.order_target not in gas_tags],
+            self.ai
         )
 
-    def get_intersections(self, p1: Point2, r1: float, p2: Point2, r2: float) -> List[Point2]:
-        """Get intersection points of two circles."""
-        d = math.sqrt((p2.x - p1.x) ** 2 + (p2.y - p1.y) ** 2)
-        
-        # Circles too far apart or contained within each other
-        if d > r1 + r2 or d < abs(r2 - r1):
-            return []
-        
-        # Circles are exactly touching
-        if d == 0 and r1 == r2:
-            return []
+    def get_intersections_batch(self, p1: np.ndarray, p2: np.ndarray, r: float = MINING_RADIUS) -> np.ndarray:
+        """Get both intersection points, as an (N, 2, 2) array, of N pairs of circles with radius r.
+
+        Every pair must cross in two points (0 < distance < 2 * r). Looking from p1 towards p2,
+        the first point lies on the right of the line between the centers, the second on the left."""
+        delta = p2 - p1
+        d_sq = np.einsum("ij,ij->i", delta, delta)
+        # Equal radii: the chord's midpoint is halfway between the centers
+        p3 = (p1 + p2) * 0.5
+        h_over_d = np.sqrt((r * r - d_sq * 0.25) / d_sq)
+        dx = h_over_d * delta[:, 1]
+        dy = h_over_d * delta[:, 0]
+        return np.stack([
+            np.stack([p3[:, 0] + dx, p3[:, 1] - dy], axis=1),
+            np.stack([p3[:, 0] - dx, p3[:, 1] + dy], axis=1),
+        ], axis=1)
+
+    def calculate_targets(self):
+        """Calculate optimal mining positions for mineral fields."""
+        self.mineral_target_dict.clear()
+        self._base_mineral_tags = None
         
-        a = (r1 * r1 - r2 * r2 + d * d) / (2 * d)
-        h = math.sqrt(r1 * r1 - a * a)
+        minerals = self.ai.mineral_field
+        townhalls = self.ai.townhalls
+        self._target_townhalls = frozenset(th.tag for th in townhalls)
+        self._target_minerals = {mf.tag: mf.position for mf in minerals}
+        if not minerals or not townhalls:
+            return
+        mf_xy = self._mineral_positions()
+        th_xy = np.array([th.position for th in townhalls], dtype=float)
         
-        p3 = Point2((p1.x + a * (p2.x - p1.x) / d, p1.y + a * (p2.y - p1.y) / d))
+        # Find closest expansion (townhall) for each mineral field
+        diff = mf_xy[:, None, :] - th_xy[None, :, :]
+        centers = th_xy[np.einsum("ijk,ijk->ij", diff, diff).argmin(axis=1)]
         
-        # One intersection point
-        if d == r1 + r2:
-            return [p3]
+        # Move targets towards their expansion
+        to_center = centers - mf_xy
+        center_dist = np.hypot(to_center[:, 0], to_center[:, 1])
+        moved = center_dist > 0
+        targets = mf_xy.copy()
+        targets[moved] += to_center[moved] / center_dist[moved, None] * MINING_RADIUS
         
-        # Two intersection points
-        dx = h * (p2.y - p1.y) / d
-        dy = h * (p2.x - p1.x) / d
+        # Check for nearby minerals that might cause collisions. Only pairs whose mining
+        # circles cross in two points matter, and like the sequential scan this used to be,
+        # the last such mineral (in mineral_field order) decides the target
+        offsets = targets[:, None, :] - mf_xy[None, :, :]
+        close = np.einsum("ijk,ijk->ij", offsets, offsets) < MINING_RADIUS ** 2
+        np.fill_diagonal(close, False)
+        pair = mf_xy[None, :, :] - mf_xy[:, None, :]
+        pair_dist = np.hypot(pair[..., 0], pair[..., 1])
+        colliding = close & (pair_dist > 0) & (pair_dist < 2 * MINING_RADIUS)
+        rows = np.flatnonzero(colliding.any(axis=1))
+        if rows.size:
+            cols = colliding.shape[1] - 1 - colliding[rows, ::-1].argmax(axis=1)
+            points = self.get_intersections_batch(mf_xy[rows], mf_xy[cols])
+            # If we found intersection points, use the one closest to base
+            to_points = points - centers[rows, None, :]
+            point_dist = np.hypot(to_points[..., 0], to_points[..., 1])
+            targets[rows] = points[np.arange(rows.size), (point_dist[:, 1] < point_dist[:, 0]).astype(int)]
         
-        return [
-            Point2((p3.x + dx, p3.y - dy)),
-            Point2((p3.x - dx, p3.y + dy))
-        ]
+        for mf, target in zip(minerals, targets.tolist()):
+            self.mineral_target_dict[mf.position] = Point2(target)
 
-    def calculate_targets(self):
-        """Calculate optimal mining positions for mineral fields."""
-        self.mineral_target_dict.clear()
-        
-        # Get expansion locations (townhall positions)
-        centers: List[Point2] = []
-        for th in self.ai.townhalls:
-            centers.append(th.position)
-            
-        # For each mineral field
-        for mf in self.ai.mineral_field:
-            target: Point2 = mf.position
-            # Find closest expansion
-            center = min(centers, key=lambda p: p.distance_to(target))
-            # Move target towards expansion
-            target = target.towards(center, MINING_RADIUS)
-            
-            # Check for nearby minerals that might cause collisions
-            close = self.ai.mineral_field.closer_than(MINING_RADIUS, target)
-            for mf2 in close:
-                if mf2.tag != mf.tag:
-                    # Get intersection points of mining circles
-                    points = self.get_intersections(
-                        mf.position, MINING_RADIUS,
-                        mf2.position, MINING_RADIUS
-                    )
-                    # If we found intersection points, use the one closest to base
-                    if len(points) == 2:
-                        target = min(points, key=lambda p: p.distance_to(center))
-            
-            self.mineral_target_dict[mf.position] = target
+    def update_targets(self) -> None:
+        """Recalculate mining targets when townhalls change or new minerals appear; mined-out ones are just dropped."""
+        mineral_tags = self.ai.mineral_field.tags
+        if (frozenset(th.tag for th in self.ai.townhalls) != self._target_townhalls or
+            not mineral_tags <= self._target_minerals.keys()):
+            self.calculate_targets()
+        elif len(mineral_tags) != len(self._target_minerals):
+            for tag in self._target_minerals.keys() - mineral_tags:
+                self.mineral_target_dict.pop(self._target_minerals.pop(tag), None)
+            self._base_mineral_tags = None
+
+    def sort_by_distance(self, units: List[Unit], origin) -> List[Unit]:
+        """Sort units by distance to a unit or position, using one NumPy pass over squared distances."""
+        if len(units) < 2:
+            return list(units)
+        diff = np.array([u.position for u in units], dtype=float) - np.array(origin.position, dtype=float)
+        return [units[int(i)] for i in np.argsort(np.einsum("ij,ij->i", diff, diff), kind="stable")]
 
     def find_long_distance_minerals(self, worker: Unit):
         """Find mineral patches at unclaimed bases for long distance mining."""
+        if self._long_distance_options is None:
+            self._long_distance_options = self.get_long_distance_options()
+        if not self._long_distance_options:
+            return None
+        
+        # Use the closest location to the worker
+        wx, wy = worker.position
+        return min(
+            self._long_distance_options,
+            key=lambda opt: (opt[0].x - wx) ** 2 + (opt[0].y - wy) ** 2
+        )[1]
+
+    def get_long_distance_options(self) -> List[Tuple[Point2, Unit]]:
+        """Get each unclaimed expansion that has minerals left, with its mineral patch that has the fewest workers."""
         # Get all expansion locations
         expansion_locations = self.ai.expansion_locations_list
         
@@ -102,24 +161,16 @@ class SpeedMining:
             not self.ai.enemy_structures.closer_than(6, pos)
         ]
         
-        if not unclaimed_locations:
-            return None
-            
-        # Sort locations by distance to worker
-        unclaimed_locations.sort(key=lambda pos: worker.distance_to(pos))
-        
-        # Check each location for minerals
+        options = []
         for pos in unclaimed_locations:
-            minerals = self.ai.mineral_field.closer_than(8, pos)
+            minerals = self.minerals_near(pos, 8)
             if minerals:
-                # Return the mineral patch with fewest workers
-                return min(minerals,
-                          key=lambda m: len([w for w in self.ai.workers if w.order_target == m.tag]))
-        return None
+                options.append((pos, min(minerals, key=lambda m: self.worker_target_counts[m.tag])))
+        return options
 
     def redistribute_workers(self):
         """Check worker distribution and transfer excess workers from oversaturated bases."""
-        current_time = time.time()
+        current_time = self.ai.time
         
         # Don't redistribute workers for first 5 seconds
         if current_time - self.start_time < self.redistribution_delay:
@@ -131,15 +182,29 @@ class SpeedMining:
 
         self.last_worker_check = current_time
 
+        # Minerals and gathering workers of each base, bucketed in one pass over the workers
+        townhalls = self.ai.townhalls
+        base_minerals = self.get_base_minerals()
+        bases_by_mineral: Dict[int, List[int]] = {}
+        for th_tag, minerals in base_minerals.items():
+            for m in minerals:
+                bases_by_mineral.setdefault(m.tag, []).append(th_tag)
+        base_workers: Dict[int, List[Unit]] = {th.tag: [] for th in townhalls}
+        for w in self.ai.workers:
+            if w.is_gathering:
+                for th_tag in bases_by_mineral.get(w.order_target, ()):
+                    base_workers[th_tag].append(w)
+        base_gatherers: Dict[int, int] = {
+            th_tag: sum(self.gathering_target_counts[m.tag] for m in minerals)
+            for th_tag, minerals in base_minerals.items()
+        }
+
         # Check each base for oversaturation
-        for base in self.ai.townhalls:
-            nearby_minerals = self.ai.mineral_field.closer_than(8, base)
-            nearby_workers = self.ai.workers.filter(
-                lambda w: w.is_gathering and w.order_target in nearby_minerals.tags
-            )
+        for base in townhalls:
+            nearby_workers = base_workers[base.tag]
             
             # If we have more than 2 workers per patch, redistribute excess
-            mineral_count = len(nearby_minerals)
+            mineral_count = len(base_minerals[base.tag])
             if mineral_count > 0:  # Only process bases with remaining minerals
                 optimal_workers = mineral_count * 2
                 current_workers = len(nearby_workers)
@@ -148,22 +213,19 @@ class SpeedMining:
                     excess_workers = nearby_workers[-int(current_workers - optimal_workers):]
                     
                     # Find other bases that aren't fully saturated
-                    other_bases = [th for th in self.ai.townhalls if th.tag != base.tag]
+                    other_bases = [th for th in townhalls if th.tag != base.tag]
                     for worker in excess_workers:
                         transferred = False
                         
                         # First try to transfer to our own bases
-                        for target_base in sorted(other_bases, key=lambda b: worker.distance_to(b)):
-                            target_minerals = self.ai.mineral_field.closer_than(8, target_base)
-                            target_workers = self.ai.workers.filter(
-                                lambda w: w.is_gathering and w.order_target in target_minerals.tags
-                            )
+                        for target_base in self.sort_by_distance(other_bases, worker):
+                            target_minerals = base_minerals[target_base.tag]
                             
                             # If this base isn't oversaturated, send worker here
-                            if len(target_workers) < len(target_minerals) * 2:
+                            if base_gatherers[target_base.tag] < len(target_minerals) * 2:
                                 # Find least saturated mineral patch
                                 best_mineral = min(target_minerals, 
-                                                key=lambda m: len([w for w in self.ai.workers if w.order_target == m.tag]))
+                                                key=lambda m: self.worker_target_counts[m.tag])
                                 worker.gather(best_mineral)
                                 transferred = True
                                 break
@@ -176,21 +238,27 @@ class SpeedMining:
 
     def handle_idle_workers(self) -> None:
         """Send idle workers to mine at the nearest base with available minerals."""
-        for worker in self.ai.workers.idle:
-            # Find bases that aren't fully saturated
-            available_bases = []
-            for th in self.ai.townhalls:
-                nearby_minerals = self.ai.mineral_field.closer_than(8, th)
-                if not nearby_minerals.exists:
-                    continue
-                    
-                nearby_workers = self.ai.workers.filter(
-                    lambda w: w.is_gathering and w.order_target in nearby_minerals.tags
-                )
+        idle_workers = self.ai.workers.idle
+        if not idle_workers:
+            return
+            
+        # Find bases that aren't fully saturated; orders only take effect next step,
+        # so this is the same for every idle worker
+        available_bases = []
+        base_minerals = self.get_base_minerals()
+        for th in self.ai.townhalls:
+            nearby_minerals = base_minerals[th.tag]
+            if not nearby_minerals.exists:
+                continue
                 
-                if len(nearby_workers) < len(nearby_minerals) * 2:
-                    available_bases.append((th, nearby_minerals))
+            nearby_workers = sum(
+                self.gathering_target_counts[m.tag] for m in nearby_minerals
+            )
             
+            if nearby_workers < len(nearby_minerals) * 2:
+                available_bases.append((th, nearby_minerals))
+        
+        for worker in idle_workers:
             assigned = False
             if available_bases:
                 # Sort by distance to worker
@@ -199,8 +267,7 @@ class SpeedMining:
                 
                 # Find mineral patch with fewest workers
                 best_mineral = min(minerals,
-                                 key=lambda m: len([w for w in self.ai.workers 
-                                                  if w.order_target == m.tag]))
+                                 key=lambda m: self.worker_target_counts[m.tag])
                 worker.gather(best_mineral)
                 assigned = True
             
@@ -212,52 +279,117 @@ class SpeedMining:
 
     def find_nearest_mining_base(self, worker: Unit) -> tuple[Unit, Unit]:
         """Find the nearest base with available minerals and a mineral patch to mine from."""
-        for th in sorted(self.ai.townhalls, key=lambda x: worker.distance_to(x)):
-            nearby_minerals = self.ai.mineral_field.closer_than(8, th)
+        for th in self.sort_by_distance(self.ai.townhalls, worker):
+            nearby_minerals = self.minerals_near(th, 8)
             if nearby_minerals:
                 # Find mineral patch with fewest workers
                 best_mineral = min(nearby_minerals, 
-                                key=lambda m: len([w for w in self.ai.workers if w.order_target == m.tag]))
+                                key=lambda m: self.worker_target_counts[m.tag])
                 return th, best_mineral
         return None, None
 
-    def speedmine_single(self, worker: Unit):
+    def _mineral_positions(self) -> np.ndarray:
+        """Get mineral field positions as an (N, 2) array, reusing the bot's per-step snapshot when current."""
+        snapshot = self.ai.frame_snapshot
+        if snapshot.is_current:
+            return snapshot.mineral_pos.astype(float)
+        return np.array([mf.position for mf in self.ai.mineral_field], dtype=float).reshape(-1, 2)
+
+    def get_closest_townhalls(self) -> Dict[int, Unit]:
+        """Map each worker tag to its closest townhall, using the bot's per-step position arrays."""
+        snapshot = self.ai.frame_snapshot
+        townhalls = self.ai.townhalls
+        if not snapshot.is_current or not townhalls:
+            return {}
+        townhall_pos = np.array([th.position for th in townhalls], dtype=np.float32)
+        diff = snapshot.worker_pos[:, None, :] - townhall_pos[None, :, :]
+        closest = np.einsum("ijk,ijk->ij", diff, diff).argmin(axis=1)
+        return {int(tag): townhalls[int(i)] for tag, i in zip(snapshot.worker_tags, closest)}
+
+    def speedmine_single(
+        self,
+        worker: Unit,
+        townhall: Optional[Unit] = None,
+        minerals_by_tag: Optional[Dict[int, Unit]] = None
+    ):
         """Optimize mining for a single worker."""
-        if not worker.orders or len(worker.orders) != 1:
+        # Cheap guards first: nothing to do for a worker whose phase has speed mining disabled
+        is_returning = worker.is_returning
+        if not (self.enable_on_return if is_returning else self.enable_on_mine):
             return
-
-        current_order = worker.orders[0]
-        
-        # Skip if no townhalls exist
-        if not self.ai.townhalls.exists:
+        orders = worker.orders
+        if len(orders) != 1:
             return
-            
-        townhall = self.ai.townhalls.closest_to(worker)
+
+        # Read the worker's position once; it goes through the proto wrapper
+        worker_pos = worker.position
+        wx, wy = worker_pos
 
         # Handle workers returning with minerals
-        if self.enable_on_return and worker.is_returning:
-            target = townhall.position.towards(worker.position, townhall.radius + worker.radius)
-            if 0.75 < worker.distance_to(target) < 2:
+        if is_returning:
+            # Skip if no townhalls exist
+            if not self.ai.townhalls.exists:
+                return
+            if townhall is None:
+                townhall = self.ai.townhalls.closest_to(worker)
+            target = townhall.position.towards(worker_pos, townhall.radius + worker.radius)
+            tx, ty = target
+            if SPEEDMINE_MIN_DIST_SQ < (wx - tx) ** 2 + (wy - ty) ** 2 < SPEEDMINE_MAX_DIST_SQ:
                 worker.move(target)
                 worker(AbilityId.SMART, townhall, queue=True)
 
-        # Handle workers gathering minerals
-        elif (self.enable_on_mine and not worker.is_returning and 
-              current_order.target in self.ai.mineral_field.tags):
-            mf = self.ai.mineral_field.find_by_tag(current_order.target)
+        # Handle workers gathering minerals; their targets only exist while we have townhalls
+        else:
+            if minerals_by_tag is None:
+                minerals_by_tag = {mf.tag: mf for mf in self.ai.mineral_field}
+            mf = minerals_by_tag.get(orders[0].target)
             if mf and mf.position in self.mineral_target_dict:
                 target = self.mineral_target_dict[mf.position]
-                if 0.75 < worker.distance_to(target) < 2:
+                tx, ty = target
+                if SPEEDMINE_MIN_DIST_SQ < (wx - tx) ** 2 + (wy - ty) ** 2 < SPEEDMINE_MAX_DIST_SQ:
                     worker.move(target)
                     worker(AbilityId.SMART, mf, queue=True)
 
+    def minerals_near(self, position, radius: float) -> Units:
+        """Get the mineral fields within a radius of a position, via a KD-tree built once per step."""
+        minerals = self.ai.mineral_field
+        if not minerals:
+            return minerals
+        if self._mineral_tree is None:
+            self._mineral_tree = cKDTree(self._mineral_positions())
+        # Sorted so the result keeps mineral_field order, like closer_than
+        indices = sorted(self._mineral_tree.query_ball_point(position.position, radius))
+        return Units([minerals[i] for i in indices], self.ai)
+
+    def get_base_minerals(self) -> Dict[int, Units]:
+        """Map each townhall tag to its nearby mineral fields, only querying positions again after a topology change."""
+        if self._base_mineral_tags is None:
+            self._base_mineral_tags = {
+                th.tag: [m.tag for m in self.minerals_near(th, 8)] for th in self.ai.townhalls
+            }
+        minerals_by_tag = self._minerals_by_tag
+        return {
+            th_tag: Units([minerals_by_tag[tag] for tag in tags], self.ai)
+            for th_tag, tags in self._base_mineral_tags.items()
+        }
+
+    def count_worker_targets(self) -> None:
+        """Count workers (and gathering workers) per order target once for this step."""
+        workers = self.ai.workers
+        self.worker_target_counts = Counter(w.order_target for w in workers)
+        self.gathering_target_counts = Counter(w.order_target for w in workers if w.is_gathering)
+
     def on_step(self) -> None:
         """Update speed mining for all workers."""
-        # Recalculate targets if needed
-        if len(self.mineral_target_dict) != len(self.ai.mineral_field):
-            self.calculate_targets()
+        self.count_worker_targets()
+        self._mineral_tree = None
+        self._long_distance_options = None
+        self._minerals_by_tag = {mf.tag: mf for mf in self.ai.mineral_field}
+        self.update_targets()
 
         self.redistribute_workers()  # Check and redistribute workers if needed
         self.handle_idle_workers()   # Handle idle workers at mined out bases
+        # Only returning workers need their closest townhall
+        closest_townhalls = self.get_closest_townhalls() if self.enable_on_return else {}
         for worker in self.get_mineral_workers():
-            self.speedmine_single(worker)
+            self.speedmine_single(worker, closest_townhalls.get(worker.tag), self._minerals_by_tag)
@@ -0,0 +1,69 @@
+"""Module for indexing our units by type once per game step."""
+
+from collections import defaultdict
+from typing import DefaultDict, Dict, List
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.position import Point2
+from sc2.unit import Unit
+from sc2.units import Units
+
+
+class UnitIndex:
+    """Groups our units by type in a single pass, shared by the bot and its managers."""
+
+    def __init__(self, bot_instance):
+        """Initialize the unit index.
+
+        Args:
+            bot_instance: The main bot instance
+        """
+        self.bot = bot_instance
+        self.by_type: DefaultDict[UnitTypeId, List[Unit]] = defaultdict(list)
+        self._trees: Dict[UnitTypeId, cKDTree] = {}  # Built lazily, per type and step
+
+    def update(self) -> None:
+        """Rebuild the index from the current units. Call once at the start of each step."""
+        self.by_type = defaultdict(list)
+        self._trees = {}
+        for unit in self.bot.units:
+            self.by_type[unit.type_id].append(unit)
+
+    def __call__(self, unit_type: UnitTypeId) -> Units:
+        """Get our units of a type, as a drop-in replacement for self.units(unit_type).
+
+        Args:
+            unit_type: The unit type to look up
+
+        Returns:
+            Units of the given type
+        """
+        return Units(self.by_type.get(unit_type, ()), self.bot)
+
+    def _tree(self, unit_type: UnitTypeId) -> cKDTree:
+        """Get the KD-tree over positions of a (non-empty) unit type, building it on first use."""
+        tree = self._trees.get(unit_type)
+        if tree is None:
+            positions = np.array([unit.position for unit in self.by_type[unit_type]], dtype=float)
+            tree = self._trees[unit_type] = cKDTree(positions)
+        return tree
+
+    def within_radius(self, unit_type: UnitTypeId, center: Point2, radius: float) -> Units:
+        """Get our units of a type within a radius of a position.
+
+        Args:
+            unit_type: The unit type to look up
+            center: Position to search around
+            radius: Search radius
+
+        Returns:
+            Units of the given type within the radius
+        """
+        units = self.by_type.get(unit_type)
+        if not units:
+            return Units([], self.bot)
+        indices = self._tree(unit_type).query_ball_point(center, radius)
+        return Units([units[i] for i in indices], self.bot)
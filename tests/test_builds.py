@@ -0,0 +1,75 @@
+"""Tests for build statistics."""
+
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from bot.builds import Build
+
+
+class SupplyHistoryTest(unittest.TestCase):
+    """Supply history migration and recording with army supplies off the SUPPLY_AMOUNTS grid."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.stats_file = Path(self._tmp.name) / "build_stats.json"
+        stats_file = self.stats_file
+
+        class TestBuild(Build):
+            STATS_FILE = stats_file
+
+        self.build_class = TestBuild
+        Build._STATS_CACHE = None
+        Build._STATS_MTIME = 0.0
+
+    def tearDown(self):
+        Build._STATS_CACHE = None
+        Build._STATS_MTIME = 0.0
+        self._tmp.cleanup()
+
+    def _load_build(self, stats: dict) -> Build:
+        self.stats_file.write_text(json.dumps(stats))
+        with redirect_stdout(StringIO()):
+            build = self.build_class("Test")
+        build.flush()
+        return build
+
+    def _history(self, build: Build, opponent_id: str = "opponent") -> dict:
+        return build._stats["Test"]["opponent_history"][opponent_id]["supply_history"]
+
+    def test_migrate_v1_keeps_off_grid_results(self):
+        build = self._load_build({"Test": {"opponent_history": {"opponent": {"supply_history": {
+            "10": {"wins": 1, "losses": 0},
+            "12": {"wins": 2, "losses": 1},
+            "60": {"wins": 0, "losses": 4},
+        }}}}})
+        history = self._history(build)
+        self.assertEqual(history["wins"][0], 3)
+        self.assertEqual(history["losses"][0], 1)
+        self.assertEqual(history["losses"][-1], 4)
+        self.assertEqual(build.stats, {"wins": 3, "losses": 5})
+
+    def test_migrate_v2_keeps_off_grid_results(self):
+        build = self._load_build({"_schema_version": 2, "Test": {"opponent_history": {"opponent": {
+            "supply_history": {"supplies": [5, 23, 25], "wins": [1, 1, 1], "losses": [0, 2, 0]},
+        }}}})
+        history = self._history(build)
+        self.assertEqual(history["wins"][0], 1)
+        self.assertEqual(history["wins"][3], 2)
+        self.assertEqual(history["losses"][3], 2)
+        self.assertEqual(sum(history["wins"]) + sum(history["losses"]), 5)
+
+    def test_record_game_off_grid_supply(self):
+        build = self._load_build({})
+        with redirect_stdout(StringIO()):
+            build.record_game(False, "opponent", 37)
+        build.flush()
+        self.assertEqual(self._history(build)["losses"][Build.SUPPLY_AMOUNTS.index(35)], 1)
+        self.assertEqual(build.stats, {"wins": 0, "losses": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
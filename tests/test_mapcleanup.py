@@ -0,0 +1,40 @@
+"""Tests for the map cleanup behaviour."""
+
+import unittest
+from types import SimpleNamespace
+
+from bot.mapcleanup import Cleanup
+
+
+class KillTrackingTest(unittest.TestCase):
+    """last_enemy_kill_time as updated from unit death events."""
+
+    def setUp(self):
+        self.ai = SimpleNamespace(time=0.0, state=SimpleNamespace(score=SimpleNamespace(killed_value_units=0)))
+        self.cleanup = Cleanup.__new__(Cleanup)
+        self.cleanup.ai = self.ai
+        self.cleanup.last_enemy_kill_time = 0
+        self.cleanup.last_enemy_kill_value = 0
+
+    def _kill(self, time: float, killed_value: int) -> None:
+        self.ai.time = time
+        self.ai.state.score.killed_value_units = killed_value
+        self.cleanup.on_unit_destroyed(1)
+
+    def test_kill_before_cleanup_checks_counts_as_made_at_their_start(self):
+        self._kill(100.0, 50)
+        self.assertEqual(self.cleanup.last_enemy_kill_time, Cleanup.EARLIEST_CLEANUP_S)
+
+    def test_kill_after_cleanup_checks_start_keeps_its_time(self):
+        self._kill(100.0, 50)
+        self._kill(420.0, 100)
+        self.assertEqual(self.cleanup.last_enemy_kill_time, 420.0)
+
+    def test_death_without_score_increase_is_ignored(self):
+        self._kill(400.0, 50)
+        self._kill(500.0, 50)
+        self.assertEqual(self.cleanup.last_enemy_kill_time, 400.0)
+
+
+if __name__ == "__main__":
+    unittest.main()